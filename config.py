@@ -19,10 +19,14 @@ class Config:
     # Default to 0 to prevent crash if not set
     BOT_OWNER = int(environ.get("BOT_OWNER", "0"))
 
+    # Job Scheduler Limits
+    MAX_JOBS = int(environ.get("MAX_JOBS", "20"))                  # Forward jobs running at once (all users)
+    JOBS_PER_ACCOUNT = int(environ.get("JOBS_PER_ACCOUNT", "2"))   # Jobs sharing one bot/userbot account
+    JOB_TIMEOUT = int(environ.get("JOB_TIMEOUT", "0"))             # Seconds before a job is stopped (0 = never)
+
 class Temp(object): 
     # Runtime Variables (बोट चलते समय ये डेटा hold करेंगे)
     LOCK = {}           # Lock for chat processes
     CANCEL = {}         # To handle cancellation requests
     FORWARDINGS = 0     # Counter for active forwards
     BANNED_USERS = []   # List of banned users
-    IS_FRWD_CHAT = []   # List of chats currently forwarding
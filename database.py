@@ -1,4 +1,6 @@
 import motor.motor_asyncio
+from pymongo import UpdateOne, ReplaceOne
+from pymongo.errors import BulkWriteError
 from config import Config
 
 class Db:
@@ -15,6 +17,10 @@ class Db:
         'protect': None,
         'button': None,
         'db_uri': None,
+        'sharding': False,
+        'mirror': False,
+        'sync': False,
+        'prescan': False,
         'filters': {
             'poll': True,
             'text': True,
@@ -33,6 +39,7 @@ class Db:
         'chat_id': None,
         'forward_id': None,
         'toid': None,
+        'targets': None,
         'last_id': None,
         'limit': None,
         'msg_id': None,
@@ -56,6 +63,10 @@ class Db:
         self.col = self.db.users
         self.nfy = self.db.notify  # Forwarding Tasks
         self.chl = self.db.channels
+        self.maps = self.db.message_map  # Source -> target message IDs
+        self.tgt = self.db.target_files  # Document keys found by target pre-scans
+        self.scans = self.db.target_scans  # Highest message ID pre-scanned per target
+        self.jobs = self.db.jobs  # Queued forward jobs waiting for a slot
 
     # ==========================
     #  User Management
@@ -178,6 +189,10 @@ class Db:
 
     async def is_userbot_exist(self, user_id):
         return bool(await self.userbot.find_one({'user_id': int(user_id)}))
+
+    async def get_workers(self, user_id):
+        """All accounts a user has linked (bot first, then userbot)"""
+        return [w for w in (await self.get_bot(user_id), await self.get_userbot(user_id)) if w]
     
     # ==========================
     #  Channels
@@ -248,5 +263,75 @@ class Db:
             upsert=True
         )
 
+    async def bulk_update_forward(self, updates):
+        """Applies {user_id: update} for many tasks in one round trip"""
+        requests = [UpdateOne({'user_id': int(user_id)}, update) for user_id, update in updates.items()]
+        if requests:
+            await self.nfy.bulk_write(requests, ordered=False)
+
+    # ==========================
+    #  Message ID Mapping
+    # ==========================
+    # Compact documents: s/i = source chat/message, t/m = target chat/message,
+    # a = account that sent it (only that account can edit or delete it)
+
+    async def create_map_index(self):
+        await self.maps.create_index([('s', 1), ('i', 1), ('t', 1)], unique=True)
+
+    async def add_mappings(self, docs):
+        """Upserts many mappings in one ordered write (if a message was sent twice, the later copy wins)"""
+        requests = [ReplaceOne({'s': d['s'], 'i': d['i'], 't': d['t']}, d, upsert=True) for d in docs]
+        if requests:
+            await self.maps.bulk_write(requests, ordered=True)
+
+    async def get_mappings(self, from_chat, msg_ids):
+        return await self.maps.find({'s': from_chat, 'i': {'$in': list(msg_ids)}}).to_list(None)
+
+    async def get_mapped_ids(self, from_chat, to_chat, first_id, last_id):
+        """Source IDs in [first_id, last_id] already sent to `to_chat`"""
+        cursor = self.maps.find({'s': from_chat, 'i': {'$gte': first_id, '$lte': last_id}, 't': to_chat}, {'_id': 0, 'i': 1})
+        return {doc['i'] async for doc in cursor}
+
+    async def delete_mappings(self, from_chat, msg_ids):
+        await self.maps.delete_many({'s': from_chat, 'i': {'$in': list(msg_ids)}})
+
+    # ==========================
+    #  Target Pre-Scan Cache
+    # ==========================
+
+    async def get_target_scan(self, chat_id):
+        doc = await self.scans.find_one({'_id': chat_id})
+        return doc['last_id'] if doc else 0
+
+    async def set_target_scan(self, chat_id, last_id):
+        await self.scans.update_one({'_id': chat_id}, {'$max': {'last_id': last_id}}, upsert=True)
+
+    async def create_target_index(self):
+        await self.tgt.create_index([('c', 1), ('k', 1)], unique=True)
+
+    async def add_target_keys(self, chat_id, keys):
+        """Stores file_unique_ids found in a target (c = chat, k = key)"""
+        try:
+            await self.tgt.insert_many([{'c': chat_id, 'k': key} for key in keys], ordered=False)
+        except BulkWriteError as e:
+            if any(err.get('code') != 11000 for err in e.details.get('writeErrors', [])): raise
+
+    async def iter_target_keys(self, chat_id):
+        async for doc in self.tgt.find({'c': chat_id}, {'_id': 0, 'k': 1}, batch_size=10000):
+            yield doc['k']
+
+    # ==========================
+    #  Job Queue
+    # ==========================
+
+    async def add_job(self, job):
+        await self.jobs.replace_one({'_id': job['_id']}, job, upsert=True)
+
+    async def remove_job(self, job_id):
+        await self.jobs.delete_one({'_id': job_id})
+
+    async def get_queued_jobs(self):
+        return self.jobs.find({}).sort('created', 1)
+
 # --- Initialize Database ---
 db = Db(Config.DATABASE_URI, Config.DATABASE_NAME)
@@ -9,6 +9,12 @@ from hydrogram.raw.types import ChannelForbidden # Monkeypatch ke liye
 from typing import Union, Optional, AsyncGenerator
 from config import Config
 from plugins.regix import restart_forwards
+from plugins.checkpoint import CHECKPOINT
+from plugins.mapping import MAPPING
+from plugins.pool import POOL
+from plugins.scheduler import SCHEDULER
+from plugins.supervisor import SUPERVISOR
+from plugins.hud import HUD
 
 # --- MONKEYPATCH (FIX FOR CRASH) ---
 # Hydrogram bug fix: ChannelForbidden object needs 'verified' attribute
@@ -65,21 +71,25 @@ class VJBot(Client):
             logger.error(f"Error during restart_forwards: {e}")
 
     async def stop(self, *args):
+        SCHEDULER.close()
+        await SUPERVISOR.shutdown()
+        await HUD.close()
+        await CHECKPOINT.flush()
+        await MAPPING.flush()
+        await POOL.close()
         await super().stop()
         logger.info("Bot Stopped. Bye!")
 
     async def iter_messages(self, chat_id, limit, offset=0):
         current = offset
-        while True:
-            new_diff = min(200, limit - current)
-            if new_diff <= 0: return
-            message_ids = list(range(current, current + new_diff + 1))
+        while current <= limit:
+            message_ids = list(range(current, min(current + 200, limit + 1)))
             try:
                 messages = await self.get_messages(chat_id, message_ids)
                 if not messages: return
+                current = message_ids[-1] + 1
                 for message in messages:
                     if message: yield message
-                    current += 1
             except FloodWait as e:
                 await asyncio.sleep(e.value)
             except Exception:
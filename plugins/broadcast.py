@@ -16,6 +16,7 @@ from hydrogram.errors import (
 # --- Custom Modules ---
 from database import db
 from config import Config
+from .hud import HUD
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -147,7 +148,4 @@ async def update_status(msg, start_time, total, done, success, blocked, deleted,
     if finished:
         text += f"\n<b>✅ COMPLETED SUCCESSFULLY</b>\n\n<b>🗑 Deleted:</b> {deleted} | <b>🚫 Blocked:</b> {blocked}"
         
-    try:
-        await msg.edit(text)
-    except Exception:
-        pass
+    HUD.publish(msg, text, final=finished)
@@ -0,0 +1,92 @@
+import asyncio
+import logging
+from database import db
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# ==============================================================================
+#  Write-Behind Progress Checkpoints
+# ==============================================================================
+
+FLUSH_INTERVAL = 30   # Seconds between timed flushes
+FLUSH_SIZE = 50       # Flush early once this many tasks have pending changes
+
+# STS key -> field in the notify document's 'details'
+COUNTERS = {
+    'fetched': 'fetched',
+    'duplicate': 'duplicate',
+    'filtered': 'filtered',
+    'deleted': 'deleted',
+    'total_files': 'total'
+}
+
+class CheckpointWriter:
+    """Collects counter deltas in memory and writes them as one bulk $inc/$max."""
+
+    def __init__(self):
+        self.seen = {}      # user_id -> last recorded counter values
+        self.pending = {}   # user_id -> {'$inc': {...}, '$max': {...}}
+        self._wake = asyncio.Event()
+        self._task = None
+        self._lock = asyncio.Lock()
+
+    def start(self, user_id, sts):
+        """Sets the baseline for a task whose details are already stored."""
+        self.seen[user_id] = {key: getattr(sts, key, 0) for key in COUNTERS}
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def record(self, user_id, sts):
+        """Queues the change since the last record (sts = STS.get(full=True))."""
+        seen = self.seen.setdefault(user_id, {key: 0 for key in COUNTERS})
+        update = self.pending.setdefault(user_id, {'$inc': {}, '$max': {}})
+        for key, field in COUNTERS.items():
+            value = getattr(sts, key, 0)
+            delta = value - seen[key]
+            if delta:
+                inc = update['$inc']
+                inc[f'details.{field}'] = inc.get(f'details.{field}', 0) + delta
+                seen[key] = value
+        update['$max']['details.offset'] = sts.offset
+        if len(self.pending) >= FLUSH_SIZE:
+            self._wake.set()
+
+    async def flush(self):
+        """Writes all pending deltas in a single bulk_write."""
+        async with self._lock:
+            if not self.pending:
+                return
+            updates, self.pending = self.pending, {}
+            for update in updates.values():
+                if not update['$inc']: del update['$inc']
+            try:
+                await db.bulk_update_forward(updates)
+            except Exception as e:
+                logger.error(f"Checkpoint flush failed: {e}")
+                # Put the deltas back so they are retried with the next flush
+                for user_id, update in updates.items():
+                    self._merge(user_id, update)
+
+    async def close(self, user_id):
+        """Forced flush when a task ends (finish, cancel or shutdown)."""
+        await self.flush()
+        self.seen.pop(user_id, None)
+
+    def _merge(self, user_id, update):
+        current = self.pending.setdefault(user_id, {'$inc': {}, '$max': {}})
+        for field, delta in update.get('$inc', {}).items():
+            current['$inc'][field] = current['$inc'].get(field, 0) + delta
+        for field, value in update.get('$max', {}).items():
+            current['$max'][field] = max(value, current['$max'].get(field, value))
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+CHECKPOINT = CheckpointWriter()
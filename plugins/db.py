@@ -1,9 +1,15 @@
 import motor.motor_asyncio
 import logging
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from hydrogram.file_id import FileId, FileUniqueId, FileUniqueType
 
 # Logger Setup
 logger = logging.getLogger(__name__)
 
+WRITE_BATCH = 500     # Buffered keys per insert_many
+READ_BATCH = 10000    # Cursor batch size when loading keys
+
 class MongoDB:
     def __init__(self, uri, db_name, collection_name):
         self.uri = uri
@@ -12,6 +18,7 @@ class MongoDB:
         self.client = None
         self.db = None
         self.files = None
+        self.buffer = []
 
     async def connect(self):
         """Establishes connection and verifies it"""
@@ -22,36 +29,83 @@ class MongoDB:
             
             self.db = self.client[self.db_name]
             self.files = self.db[self.collection_name]
+            # Partial: legacy documents without the key must not collide as nulls
+            await self.files.create_index(
+                "file_unique_id", unique=True,
+                partialFilterExpression={"file_unique_id": {"$exists": True}}
+            )
             return True
         except Exception as e:
             logger.error(f"Failed to connect to User DB: {e}")
             return False
 
     async def close(self):
-        """Closes the connection"""
+        """Flushes buffered keys and closes the connection"""
         if self.client:
+            await self.flush()
             self.client.close()
 
-    async def add_file(self, file_id):
-        """Adds a file ID to the collection"""
+    async def add_file(self, file_unique_id):
+        """Buffers a file's unique ID; written in batches of WRITE_BATCH"""
+        self.buffer.append({"file_unique_id": file_unique_id})
+        if len(self.buffer) >= WRITE_BATCH:
+            await self.flush()
+
+    async def flush(self):
+        """Writes buffered keys with one unordered insert_many"""
+        if not self.buffer:
+            return
+        docs, self.buffer = self.buffer, []
+        await self._write(self.files.insert_many(docs, ordered=False))
+
+    async def _write(self, operation):
         try:
-            await self.files.insert_one({"file_id": file_id})
-        except Exception:
-            pass
+            await operation
+        except BulkWriteError as e:
+            # Duplicate keys (code 11000) are expected and harmless
+            errors = [err for err in e.details.get('writeErrors', []) if err.get('code') != 11000]
+            if errors: logger.error(f"User DB write failed for {len(errors)} keys: {errors[0].get('errmsg')}")
+        except Exception as e:
+            logger.error(f"User DB write failed: {e}")
 
-    async def is_file_exist(self, file_id):
-        """Checks if file ID exists"""
-        f = await self.files.find_one({"file_id": file_id})
+    async def is_file_exist(self, file_unique_id):
+        """Checks if file unique ID exists"""
+        f = await self.files.find_one({"file_unique_id": file_unique_id}, {"_id": 1})
         return bool(f)
+
+    async def count_files(self):
+        return await self.files.estimated_document_count()
         
     async def get_all_files(self):
-        """Returns all stored file IDs"""
-        return self.files.find({})
+        """Returns a cursor over stored keys (projection only)"""
+        return self.files.find({}, {"file_unique_id": 1, "file_id": 1}, batch_size=READ_BATCH)
+
+    async def iter_keys(self):
+        """Streams stored file unique IDs, converting (and backfilling) legacy file_id documents"""
+        legacy = []
+        async for doc in await self.get_all_files():
+            key = doc.get("file_unique_id")
+            if not key and doc.get("file_id"):
+                key = legacy_key(doc["file_id"])
+                if key: legacy.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"file_unique_id": key}}))
+                if len(legacy) >= WRITE_BATCH:
+                    await self._write(self.files.bulk_write(legacy, ordered=False)); legacy = []
+            if key: yield key
+        if legacy: await self._write(self.files.bulk_write(legacy, ordered=False))
         
     async def drop_all(self):
         """Deletes the entire collection (Clean up)"""
+        self.buffer = []
         await self.files.drop()
 
+def legacy_key(file_id):
+    """file_unique_id of a document file_id stored by older versions (None if it can't be decoded)"""
+    try:
+        media_id = FileId.decode(file_id).media_id
+    except Exception:
+        return None
+    return FileUniqueId(file_unique_type=FileUniqueType.DOCUMENT, media_id=media_id).encode()
+
 # ==============================================================================
 #  Helper Function to Initialize Connection
 # ==============================================================================
@@ -0,0 +1,148 @@
+import sys
+import math
+import hashlib
+import logging
+from hydrogram import enums
+from database import db
+from .test import iter_search, latest_message
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# ==============================================================================
+#  Duplicate Index (keyed by file_unique_id)
+# ==============================================================================
+
+# Above this many stored keys, preload into a Bloom filter instead of a set
+BLOOM_THRESHOLD = 1_000_000
+BLOOM_ERROR_RATE = 0.001
+SCAN_BATCH = 500   # Target keys per cache write
+
+class BloomFilter:
+    """Fixed-size Bloom filter using double hashing over one blake2b digest."""
+
+    def __init__(self, capacity, error_rate=BLOOM_ERROR_RATE):
+        capacity = max(1, capacity)
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, key):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+class DedupIndex:
+    """O(1) membership for file_unique_ids seen in this task or stored in the user DB.
+
+    Keys added during the task live in a set. When the user DB holds more than
+    BLOOM_THRESHOLD keys they are preloaded into a Bloom filter instead, and a
+    Bloom hit is confirmed against the DB so false positives never drop a file.
+    """
+
+    def __init__(self, store=None):
+        self.store = store
+        self.keys = set()
+        self.bloom = None
+        self.loaded = 0
+        self.unsent = {}  # source msg id -> key, in ID order; stored once the send commits
+
+    async def load(self):
+        """Streams existing keys from the user DB (projection only)."""
+        if not self.store:
+            return self
+        total = await self.store.count_files()
+        if total > BLOOM_THRESHOLD:
+            self.bloom = BloomFilter(total)
+        target = self.bloom if self.bloom is not None else self.keys
+        async for key in self.store.iter_keys():
+            target.add(key)
+            self.loaded += 1
+        logger.info(f"Dedup index loaded {self.loaded} keys ({'bloom' if self.bloom else 'set'}), {self.footprint() / (1024 * 1024):.1f} MB")
+        return self
+
+    async def check(self, key):
+        """True if `key` was already seen."""
+        if key in self.keys:
+            return True
+        if self.bloom is not None and key in self.bloom:
+            return await self.store.is_file_exist(key)
+        return False
+
+    def add(self, key):
+        self.keys.add(key)
+
+    def hold(self, message_id, key):
+        """Marks `key` as seen now; it reaches the user DB only via commit()."""
+        self.keys.add(key)
+        self.unsent[message_id] = key
+
+    async def commit(self, offset):
+        """Stores the held keys of messages below `offset` (their sends are committed).
+
+        Read-ahead keys must not be stored early: a resumed task restarts from the
+        committed offset and would skip those files as duplicates.
+        """
+        while self.unsent:
+            message_id = next(iter(self.unsent))
+            if message_id >= offset: break
+            key = self.unsent.pop(message_id)
+            if self.store: await self.store.add_file(key)
+
+    def __len__(self):
+        return self.loaded + len(self.keys)
+
+    def footprint(self):
+        """Approximate memory used by the index, in bytes."""
+        size = sys.getsizeof(self.keys)
+        if self.keys:
+            sample = next(iter(self.keys))
+            size += len(self.keys) * sys.getsizeof(sample)
+        if self.bloom is not None:
+            size += sys.getsizeof(self.bloom.bits)
+        return size
+
+async def scan_target(workers, chat_id, index):
+    """Adds the documents already in a target chat to `index`.
+
+    Keys are cached per target, so each run only searches messages above the
+    last scanned ID. Reading history needs a userbot; with only bots the
+    cached keys are still used. Returns the number of keys added.
+    """
+    added = 0
+    async for key in db.iter_target_keys(chat_id):
+        index.add(key)
+        added += 1
+
+    client = next((c for c in workers if not c.me.is_bot), None)
+    if client is None:
+        return added
+    message = await latest_message(client, chat_id)
+    top = message.id if message else 0
+    last_id = await db.get_target_scan(chat_id)
+    if top <= last_id:
+        return added
+
+    await db.create_target_index()
+    batch = []
+    async for message in iter_search(client, chat_id, top, last_id + 1, [enums.MessagesFilter.DOCUMENT]):
+        if not message.document: continue
+        index.add(message.document.file_unique_id)
+        batch.append(message.document.file_unique_id)
+        if len(batch) >= SCAN_BATCH:
+            await db.add_target_keys(chat_id, batch)
+            added += len(batch); batch = []
+    if batch:
+        await db.add_target_keys(chat_id, batch)
+        added += len(batch)
+    await db.set_target_scan(chat_id, top)
+    logger.info(f"Target {chat_id} pre-scan: {added} keys, scanned up to {top}")
+    return added
@@ -0,0 +1,66 @@
+import re
+from hydrogram import enums
+
+# ==============================================================================
+#  Compiled Per-Task Filter Chain
+# ==============================================================================
+
+MEDIA_TYPES = frozenset(['photo', 'video', 'document', 'audio', 'voice', 'sticker', 'animation'])
+LINK_ENTITIES = frozenset([enums.MessageEntityType.URL, enums.MessageEntityType.TEXT_LINK])
+
+class FilterChain:
+    """Predicates compiled once per task from STS.get_data()'s `datas`.
+
+    `reject(message)` runs synchronously and returns the name of the first
+    predicate that drops the message (or None); `hits` counts each reason.
+    """
+
+    def __init__(self, predicates):
+        self.predicates = predicates
+        self.hits = {name: 0 for name, _ in predicates}
+
+    def reject(self, message):
+        for name, predicate in self.predicates:
+            if predicate(message):
+                self.hits[name] += 1
+                return name
+        return None
+
+    def summary(self):
+        return " | ".join(f"{name}: {count}" for name, count in self.hits.items() if count)
+
+def compile_filters(datas):
+    """Builds the FilterChain for a task; disabled checks are left out entirely."""
+    disabled = set(datas.get('filters') or [])
+    predicates = []
+
+    blocked_media = frozenset(MEDIA_TYPES & disabled)
+    if blocked_media:
+        predicates.append(('type', lambda m: m.media is not None and m.media.value in blocked_media))
+    if 'text' in disabled:
+        predicates.append(('text', lambda m: bool(m.text)))
+    if 'poll' in disabled:
+        predicates.append(('poll', lambda m: m.poll is not None))
+    if 'link' in disabled:
+        predicates.append(('link', _has_link))
+
+    if datas.get('extensions'):
+        ext = re.compile("|".join(datas['extensions']))
+        predicates.append(('extension', lambda m: m.document is not None and bool(ext.search(m.document.file_name or ""))))
+    if datas.get('keywords'):
+        keys = re.compile("|".join(datas['keywords']))
+        predicates.append(('keyword', lambda m: m.document is not None and bool(keys.search(m.document.file_name or ""))))
+
+    mn = (datas.get('min_size') or 0) * 1024 * 1024
+    mx = (datas.get('max_size') or 0) * 1024 * 1024
+    if mn or mx:
+        predicates.append(('size', lambda m: m.document is not None and not ((not mn or m.document.file_size >= mn) and (not mx or m.document.file_size <= mx))))
+
+    return FilterChain(predicates)
+
+def _has_link(message):
+    for entities in (message.entities, message.caption_entities):
+        if entities:
+            for entity in entities:
+                if entity.type in LINK_ENTITIES: return True
+    return False
@@ -0,0 +1,114 @@
+import time
+import asyncio
+import logging
+from hydrogram.errors import FloodWait, MessageNotModified
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# ==============================================================================
+#  Coalesced Status HUD Renderer
+# ==============================================================================
+
+MIN_INTERVAL = 5    # Seconds between edits of the same message
+EDIT_RATE = 1.0     # Edits per second for the whole bot (leaves room for real replies)
+BURST = 3           # Edits that may go out back to back after a quiet spell
+TICK = 0.5
+STALE_AFTER = 3600  # Forget edit history of messages untouched this long
+
+class Frame:
+    __slots__ = ('msg', 'text', 'markup', 'final', 'fingerprint')
+
+    def __init__(self, msg, text, markup, final):
+        self.msg = msg
+        self.text = text
+        self.markup = markup
+        self.final = final
+        self.fingerprint = hash((text, str(markup)))
+
+class HudRenderer:
+    """Single writer for every status message the bot keeps editing.
+
+    Publishers hand over the latest text and never wait on Telegram. Only the
+    newest frame per message is kept; a message is edited at most every
+    MIN_INTERVAL seconds (final frames skip that wait), frames identical to
+    what is shown are dropped, and all edits share one EDIT_RATE budget.
+    A FloodWait pauses the renderer, and pending frames go out afterwards.
+    """
+
+    def __init__(self):
+        self.pending = {}     # (chat_id, msg_id) -> newest unsent Frame
+        self.shown = {}       # (chat_id, msg_id) -> fingerprint on screen
+        self.last_edit = {}   # (chat_id, msg_id) -> monotonic time of last edit
+        self.tokens = BURST
+        self.refilled = time.monotonic()
+        self.paused_until = 0.0
+        self._task = None
+
+    def publish(self, msg, text, markup=None, final=False):
+        """Queues `text` for `msg`, replacing any frame not yet shown."""
+        if msg is None: return
+        key = (msg.chat.id, msg.id)
+        frame = Frame(msg, text, markup, final)
+        if self.shown.get(key) == frame.fingerprint:
+            self.pending.pop(key, None)
+            return
+        previous = self.pending.get(key)
+        # A final frame stays final even if a progress frame lands after it
+        frame.final = final or bool(previous and previous.final)
+        self.pending[key] = frame
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Drops unsent frames and stops the render loop (shutdown)."""
+        self.pending.clear()
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def _run(self):
+        while self.pending:
+            now = time.monotonic()
+            if now < self.paused_until:
+                await asyncio.sleep(self.paused_until - now)
+                continue
+            self.tokens = min(BURST, self.tokens + (now - self.refilled) * EDIT_RATE)
+            self.refilled = now
+            # Final frames first, then the messages that waited longest
+            due = sorted(
+                (key for key, frame in self.pending.items() if frame.final or now - self.last_edit.get(key, 0) >= MIN_INTERVAL),
+                key=lambda key: (not self.pending[key].final, self.last_edit.get(key, 0))
+            )
+            for key in due:
+                if self.tokens < 1 or now < self.paused_until: break
+                self.tokens -= 1
+                await self._edit(key, self.pending.pop(key))
+            self._prune(now)
+            await asyncio.sleep(TICK)
+
+    async def _edit(self, key, frame):
+        try:
+            await frame.msg.edit(frame.text, reply_markup=frame.markup)
+        except MessageNotModified:
+            pass
+        except FloodWait as e:
+            logger.warning(f"HUD FloodWait {e.value}s, holding {len(self.pending) + 1} status edit(s)")
+            self.paused_until = time.monotonic() + e.value
+            self.pending.setdefault(key, frame)
+            return
+        except Exception as e:
+            logger.debug(f"HUD edit failed for {key}: {e}")
+        if frame.final:
+            self.shown.pop(key, None)
+            self.last_edit.pop(key, None)
+        else:
+            self.shown[key] = frame.fingerprint
+            self.last_edit[key] = time.monotonic()
+
+    def _prune(self, now):
+        for key in [k for k, t in self.last_edit.items() if now - t > STALE_AFTER and k not in self.pending]:
+            self.last_edit.pop(key, None)
+            self.shown.pop(key, None)
+
+HUD = HudRenderer()
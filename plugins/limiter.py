@@ -0,0 +1,106 @@
+import time
+import asyncio
+import logging
+from hydrogram.errors import FloodWait
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# ==============================================================================
+#  Adaptive Rate Limiter (AIMD Token Bucket)
+# ==============================================================================
+
+# Requests per second, per account type
+START_RATE = {'bot': 0.5, 'user': 0.3}
+MIN_RATE = 0.05
+MAX_RATE = {'bot': 3.0, 'user': 1.0}
+INCREASE = 0.02       # Additive increase after every successful call
+DECREASE = 0.5        # Multiplicative decrease on FloodWait
+
+# Last rate learned per account type; new accounts start from here
+LEARNED = dict(START_RATE)
+
+# account_id -> RateLimiter, (account_id, chat_id) -> per-target RateLimiter
+LIMITERS = {}
+
+class RateLimiter:
+    """Token bucket whose refill rate speeds up on success and backs off on FloodWait."""
+
+    def __init__(self, kind, parent=None):
+        self.kind = kind
+        # Per-chat limiters also draw from their account's bucket
+        self.parent = parent
+        self.rate = LEARNED[kind]
+        self.tokens = 1.0
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    @property
+    def capacity(self):
+        # At most one second worth of burst
+        return max(1.0, self.rate)
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, cost=1):
+        """Waits until `cost` tokens are available (FIFO across callers)."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self._refill(now)
+                if self.tokens >= cost:
+                    self.tokens -= cost
+                    break
+                await asyncio.sleep((cost - self.tokens) / self.rate)
+        if self.parent: await self.parent.acquire(cost)
+
+    def success(self):
+        self.rate = min(MAX_RATE[self.kind], self.rate + INCREASE)
+        if self.parent: self.parent.success()
+        else: LEARNED[self.kind] = self.rate
+
+    def flood(self, seconds):
+        self.rate = max(MIN_RATE, self.rate * DECREASE)
+        self.tokens = 0.0
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        if self.parent:
+            # The wait may be chat-scoped: pause this target, only slow the account
+            self.parent.rate = max(MIN_RATE, self.parent.rate * DECREASE)
+            return logger.warning(f"FloodWait {seconds}s on {self.kind} chat, rate -> {self.rate:.2f}/s")
+        LEARNED[self.kind] = self.rate
+        logger.warning(f"FloodWait {seconds}s on {self.kind} account, rate -> {self.rate:.2f}/s")
+
+    async def call(self, func, *args, cost=1, **kwargs):
+        """Runs `func` under the limiter, retrying after FloodWait."""
+        while True:
+            await self.acquire(cost)
+            try:
+                result = await func(*args, **kwargs)
+            except FloodWait as e:
+                self.flood(e.value)
+                continue
+            self.success()
+            return result
+
+def get_limiter(client, chat_id=None):
+    """Returns the limiter of a started client (one per Telegram account).
+
+    With `chat_id`, returns that account's limiter for sends to one chat, so a
+    FloodWait on one target does not stall the others.
+    """
+    me = client.me
+    limiter = LIMITERS.get(me.id)
+    if limiter is None:
+        limiter = LIMITERS[me.id] = RateLimiter('bot' if me.is_bot else 'user')
+    if chat_id is None:
+        return limiter
+    key = (me.id, chat_id)
+    if key not in LIMITERS:
+        LIMITERS[key] = RateLimiter(limiter.kind, parent=limiter)
+    return LIMITERS[key]
@@ -0,0 +1,70 @@
+import asyncio
+import logging
+from database import db
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# ==============================================================================
+#  Source -> Target Message ID Map (Write-Behind)
+# ==============================================================================
+
+FLUSH_INTERVAL = 10   # Seconds between timed flushes
+WRITE_BATCH = 500     # Flush early once this many mappings are buffered
+
+class MessageMap:
+    """Buffers (source chat, source id) -> (target chat, target id) pairs and writes them in batches."""
+
+    def __init__(self):
+        self.buffer = []
+        self.indexed = False
+        self._wake = asyncio.Event()
+        self._task = None
+        self._lock = asyncio.Lock()
+
+    def record(self, from_chat, to_chat, account_id, pairs):
+        """Queues [(source_id, target_id), ...] sent by `account_id`."""
+        for source_id, target_id in pairs:
+            self.buffer.append({'s': from_chat, 'i': source_id, 't': to_chat, 'm': target_id, 'a': account_id})
+        if len(self.buffer) >= WRITE_BATCH:
+            self._wake.set()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def flush(self):
+        async with self._lock:
+            if not self.buffer:
+                return
+            docs, self.buffer = self.buffer, []
+            try:
+                if not self.indexed:
+                    await db.create_map_index()
+                    self.indexed = True
+                await db.add_mappings(docs)
+            except Exception as e:
+                logger.error(f"Message map flush failed: {e}")
+                self.buffer = docs + self.buffer
+
+    async def lookup(self, from_chat, msg_ids):
+        """Mapping documents of the given source messages, across all targets."""
+        await self.flush()
+        return await db.get_mappings(from_chat, msg_ids)
+
+    async def sent_ids(self, from_chat, to_chat, first_id, last_id):
+        """Source IDs in [first_id, last_id] already delivered to `to_chat`."""
+        await self.flush()
+        return await db.get_mapped_ids(from_chat, to_chat, first_id, last_id)
+
+    async def forget(self, from_chat, msg_ids):
+        await db.delete_mappings(from_chat, msg_ids)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+MAPPING = MessageMap()
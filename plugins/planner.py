@@ -0,0 +1,127 @@
+import math
+import logging
+from hydrogram import Client, filters, raw
+from script import Script
+from .utils import STS
+from .pool import POOL
+from .db import connect_user_db
+from .limiter import get_limiter
+from .filtering import compile_filters
+from .test import SEARCH_FILTERS, GAP_RATIO, plan_search_filters
+from .regix import start_workers, resolve_date_bounds, TimeFormatter
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# ==============================================================================
+#  Dry-Run Planner
+# ==============================================================================
+
+SAMPLE_BATCHES = 8   # get_messages batches spread evenly over the range
+BATCH_SIZE = 100
+
+@Client.on_callback_query(filters.regex(r'^plan_public'))
+async def plan_public_forward(bot, query):
+    user_id = query.from_user.id
+    frwd_id = query.data.split("_")[2]
+    sts = STS(frwd_id)
+    if not sts.verify(): return await query.answer("Task expired!", show_alert=True)
+
+    _bot, caption, forward_tag, datas, protect, button = await sts.get_data(user_id)
+    if not _bot: return await query.answer("No Client Found!", show_alert=True)
+    await query.answer("Sampling the source...")
+    status = await query.message.reply("<code>Planning...</code>")
+
+    try: workers = await start_workers(user_id, _bot, datas)
+    except Exception as e: return await status.edit(f"Error: {e}")
+    try:
+        plan = await estimate(user_id, workers, sts, datas, forward_tag, caption, button)
+        await status.edit(Script.PLAN_TXT.format(**plan))
+    except Exception as e:
+        logger.error(f"Plan Error: {e}")
+        await status.edit(f"<b>ERROR:</b>\n<code>{e}</code>")
+    finally:
+        for client in workers: await POOL.release(client)
+
+async def estimate(user_id, workers, sts, datas, forward_tag, caption, button):
+    """Runs the task's filters over a sample of the source and projects the job.
+
+    Nothing is sent. Counts scale the sample to the whole range; duplicates
+    are checked within the sample and against the user DB, so they are a
+    lower bound. Per-type media counts are exact but need a userbot.
+    """
+    client = workers[0]
+    if sts.get('start_date') or sts.get('end_date'):
+        await resolve_date_bounds(client, sts)
+    first, last = sts.get('offset'), sts.get('limit')
+    span = max(0, last - first + 1)
+    limiter = get_limiter(client)
+    chain = compile_filters(datas)
+
+    store = None
+    if datas['skip_duplicate'] and datas['db_uri']:
+        connected, store = await connect_user_db(user_id, datas['db_uri'], sts.get('TO'))
+        if not connected: store = None
+
+    counts = {'sent': 0, 'filtered': 0, 'duplicate': 0, 'deleted': 0}
+    seen = set()
+    sampled = 0
+    batches = min(SAMPLE_BATCHES, math.ceil(span / BATCH_SIZE))
+    try:
+        for b in range(batches):
+            start = first + int(b * span / batches)
+            message_ids = list(range(start, min(start + BATCH_SIZE, last + 1)))
+            messages = await limiter.call(client.get_messages, sts.get('FROM'), message_ids)
+            sampled += len(message_ids)
+            for message in messages:
+                if not message or message.empty or message.service: counts['deleted'] += 1; continue
+                if chain.reject(message): counts['filtered'] += 1; continue
+                if datas['skip_duplicate'] and message.document:
+                    key = message.document.file_unique_id
+                    if key in seen or (store and await store.is_file_exist(key)): counts['duplicate'] += 1; continue
+                    seen.add(key)
+                counts['sent'] += 1
+    finally:
+        if store: await store.close()
+
+    scale = span / sampled if sampled else 0
+    projected = {key: round(value * scale) for key, value in counts.items()}
+
+    media = ""
+    if not client.me.is_bot:
+        # limit=0 Search returns only the match count, bounded to the ID range
+        peer = await client.resolve_peer(sts.get('FROM'))
+        found = []
+        for name, search_filter in SEARCH_FILTERS.items():
+            r = await limiter.call(client.invoke, raw.functions.messages.Search(
+                peer=peer, q="", filter=search_filter.value(), min_date=0, max_date=0,
+                offset_id=0, add_offset=0, limit=0, max_id=last + 1, min_id=first - 1, hash=0
+            ))
+            found.append(f"{name}: {getattr(r, 'count', len(r.messages))}")
+        media = f"<b>🗂 Media in Range:</b> `{' | '.join(found)}`\n"
+
+    # Same fetch path run_forward_logic will pick
+    search_filters = None if len(workers) > 1 or client.me.is_bot else plan_search_filters(datas['filters'])
+    existing = span - projected['deleted']
+    if search_filters:
+        fetch_calls = math.ceil((projected['sent'] + projected['duplicate']) / BATCH_SIZE) + len(search_filters)
+    elif len(workers) == 1 and not client.me.is_bot and span and projected['deleted'] >= span * GAP_RATIO:
+        fetch_calls = math.ceil(existing / BATCH_SIZE)
+    else:
+        fetch_calls = math.ceil(span / BATCH_SIZE)
+
+    # send_stage batches 100 per call unless each message needs its own caption/buttons
+    targets = len(sts.get('TARGETS') or [sts.get('TO')])
+    batched = forward_tag or not (button or caption)
+    send_calls = (math.ceil(projected['sent'] / BATCH_SIZE) if batched else projected['sent']) * targets
+
+    rate = sum(get_limiter(worker).rate for worker in workers)
+    calls = fetch_calls + send_calls
+    return {
+        'first': first, 'last': last, 'span': span,
+        'sampled': sampled, 'batches': batches, 'media': media,
+        **projected,
+        'calls': calls, 'fetch_calls': fetch_calls, 'send_calls': send_calls,
+        'rate': rate, 'workers': len(workers),
+        'duration': TimeFormatter(calls / rate * 1000) if rate else "-"
+    }
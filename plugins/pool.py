@@ -0,0 +1,101 @@
+import time
+import asyncio
+import logging
+from .test import get_client
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# ==============================================================================
+#  Persistent Worker Client Pool
+# ==============================================================================
+
+IDLE_TTL = 600         # Stop clients unused for this many seconds
+HEALTH_AFTER = 120     # Ping reused clients idle longer than this
+SWEEP_INTERVAL = 60
+
+class PooledClient:
+    __slots__ = ('client', 'refs', 'last_used')
+
+    def __init__(self, client):
+        self.client = client
+        self.refs = 0
+        self.last_used = time.monotonic()
+
+class ClientPool:
+    """Started worker clients keyed by bot token / session string, shared across tasks."""
+
+    def __init__(self):
+        self.entries = {}    # key -> PooledClient
+        self.owners = {}     # id(client) -> key
+        self.locks = {}
+        self._sweeper = None
+
+    async def acquire(self, data, is_bot=True):
+        """Returns a started client for `data`, creating or reviving it if needed."""
+        key = ('bot' if is_bot else 'user', data)
+        lock = self.locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            entry = self.entries.get(key)
+            if entry and not await self._healthy(entry):
+                await self._drop(key)
+                entry = None
+            if entry is None:
+                client = await get_client(data, is_bot=is_bot)
+                await client.start()
+                entry = self.entries[key] = PooledClient(client)
+                self.owners[id(client)] = key
+            entry.refs += 1
+            entry.last_used = time.monotonic()
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.create_task(self._sweep())
+        return entry.client
+
+    async def release(self, client):
+        """Returns a client to the pool; it stays connected until idle for IDLE_TTL."""
+        key = self.owners.get(id(client))
+        entry = self.entries.get(key)
+        if entry is None or entry.client is not client:
+            # Not pooled (or already dropped): just stop it
+            try: await client.stop()
+            except Exception: pass
+            return
+        entry.refs = max(0, entry.refs - 1)
+        entry.last_used = time.monotonic()
+
+    async def close(self):
+        """Stops every pooled client (shutdown)."""
+        for key in list(self.entries):
+            await self._drop(key)
+
+    async def _healthy(self, entry):
+        if not entry.client.is_connected:
+            return False
+        if entry.refs or time.monotonic() - entry.last_used < HEALTH_AFTER:
+            return True
+        try:
+            await entry.client.get_me()
+            return True
+        except Exception as e:
+            logger.warning(f"Pooled client failed health check: {e}")
+            return False
+
+    async def _drop(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        self.owners.pop(id(entry.client), None)
+        try: await entry.client.stop()
+        except Exception: pass
+
+    async def _sweep(self):
+        while self.entries:
+            await asyncio.sleep(SWEEP_INTERVAL)
+            now = time.monotonic()
+            for key, entry in list(self.entries.items()):
+                if entry.refs == 0 and now - entry.last_used > IDLE_TTL:
+                    async with self.locks.setdefault(key, asyncio.Lock()):
+                        if entry.refs == 0:
+                            await self._drop(key)
+
+POOL = ClientPool()
@@ -1,5 +1,6 @@
 import re
 import asyncio
+from datetime import datetime
 from hydrogram import Client, filters, enums
 from hydrogram.errors import (
     ChannelPrivate, 
@@ -23,6 +24,8 @@ from script import Script
 
 # Regex for parsing Telegram Links
 LINK_REGEX = re.compile(r"(?:https?://)?(?:t\.me|telegram\.me|telegram\.dog)/(?:c/)?(\d+|[a-zA-Z_0-9]+)/(\d+)$")
+# Date range for the skip prompt: "2024-03-01" or "2024-03-01 2024-04-30"
+DATE_REGEX = re.compile(r"^(\d{4}-\d{2}-\d{2})(?:\s+(\d{4}-\d{2}-\d{2}))?$")
 
 @Client.on_message(filters.private & filters.command(["forward"]))
 async def forward_command_handler(bot, message):
@@ -46,38 +49,47 @@ async def forward_command_handler(bot, message):
             quote=True
         )
 
-    # 3. Select Target Channel
-    target_chat_id = None
-    target_title = None
+    # 3. Select Target Channels (tap several, then Done)
+    titles = {channel['chat_id']: channel['title'] for channel in channels}
+    selected = []
 
     if len(channels) > 1:
-        # Create Keyboard
-        buttons = []
         chan_map = {} # Map title to ID
         for channel in channels:
-            buttons.append([KeyboardButton(channel['title'])])
             chan_map[channel['title']] = channel['chat_id']
-        
-        buttons.append([KeyboardButton("❌ Cancel")])
-        
-        question = await bot.ask(
-            message.chat.id, 
-            Script.TO_MSG, 
-            reply_markup=ReplyKeyboardMarkup(buttons, one_time_keyboard=True, resize_keyboard=True)
-        )
-        
-        if question.text in ["/cancel", "❌ Cancel"]:
-            return await message.reply(Script.CANCEL, reply_markup=ReplyKeyboardRemove())
-            
-        target_title = question.text
-        target_chat_id = chan_map.get(target_title)
-        
-        if not target_chat_id:
-            return await message.reply("<b>❌ Invalid Channel Selected!</b>", reply_markup=ReplyKeyboardRemove())
+
+        while True:
+            # Create Keyboard, marking the channels picked so far
+            buttons = [[KeyboardButton(f"✅ {title}" if chat in selected else title)] for title, chat in chan_map.items()]
+            buttons.append([KeyboardButton("📢 All Channels")])
+            buttons.append([KeyboardButton("✔️ Done"), KeyboardButton("❌ Cancel")])
+
+            question = await bot.ask(
+                message.chat.id,
+                Script.TO_MORE_MSG.format(len(selected)) if selected else Script.TO_MSG,
+                reply_markup=ReplyKeyboardMarkup(buttons, one_time_keyboard=True, resize_keyboard=True)
+            )
+
+            if question.text in ["/cancel", "❌ Cancel"]:
+                return await message.reply(Script.CANCEL, reply_markup=ReplyKeyboardRemove())
+
+            if question.text == "📢 All Channels":
+                selected = list(chan_map.values())
+                break
+            if question.text == "✔️ Done":
+                if selected: break
+                await message.reply("<b>⚠️ Select at least one channel.</b>")
+                continue
+
+            # Tapping a channel again unselects it
+            target = chan_map.get((question.text or "").removeprefix("✅ "))
+            if not target:
+                return await message.reply("<b>❌ Invalid Channel Selected!</b>", reply_markup=ReplyKeyboardRemove())
+            if target in selected: selected.remove(target)
+            else: selected.append(target)
     else:
         # Auto-select if only one channel
-        target_chat_id = channels[0]['chat_id']
-        target_title = channels[0]['title']
+        selected = [channels[0]['chat_id']]
 
     # 4. Get Source Chat (Link or Forward)
     # --- FIX: Handle cleanup correctly ---
@@ -122,22 +134,49 @@ async def forward_command_handler(bot, message):
         return await message.reply("<b>❌ Invalid Input!</b>\nPlease Forward a message from the channel or Send its Link.")
 
     # -- Logic: Fetch Chat Title (Optional Check) --
+    source_ids = {chat_id}
     try:
         chat_info = await bot.get_chat(chat_id)
         source_title = chat_info.title
+        source_ids.add(chat_info.id)
     except Exception:
         pass
 
+    # A channel never forwards into itself
+    selected = [chat for chat in selected if chat not in source_ids]
+    if not selected:
+        return await message.reply("<b>❌ Error:</b> The source is the only target selected.")
+
+    # Fan out: one source scan, sent to every selected channel
+    target_chat_id = selected[0]
+    targets = selected if len(selected) > 1 else None
+    target_title = titles[target_chat_id] if not targets else f"{len(targets)} Channels: " + ", ".join(titles[chat] for chat in targets)
+
     # 5. Get Skip Count
     skip_prompt = await bot.ask(message.chat.id, Script.SKIP_MSG)
     
     if skip_prompt.text.startswith('/'):
         return await message.reply(Script.CANCEL)
     
-    try:
-        skip_count = int(skip_prompt.text)
-    except ValueError:
-        return await message.reply("<b>❌ Error:</b> Please enter a valid number (Integer).")
+    # Either a skip count or a date range ("YYYY-MM-DD" or "YYYY-MM-DD YYYY-MM-DD")
+    skip_count = 0
+    start_date = end_date = None
+    date_match = DATE_REGEX.match(skip_prompt.text.strip())
+    if date_match:
+        try:
+            start_date = datetime.strptime(date_match.group(1), "%Y-%m-%d")
+            end_date = datetime.strptime(date_match.group(2), "%Y-%m-%d") if date_match.group(2) else None
+        except ValueError:
+            return await message.reply("<b>❌ Error:</b> Invalid date. Use <code>YYYY-MM-DD</code>.")
+        if end_date and end_date < start_date:
+            return await message.reply("<b>❌ Error:</b> End date is before start date.")
+        skip_text = f"{date_match.group(1)} → {date_match.group(2) or 'Latest'}"
+    else:
+        try:
+            skip_count = int(skip_prompt.text)
+        except ValueError:
+            return await message.reply("<b>❌ Error:</b> Please enter a valid number (Integer) or date.")
+        skip_text = skip_count
 
     # 6. Final Confirmation
     forward_id = f"{user_id}-{skip_prompt.id}" 
@@ -145,10 +184,12 @@ async def forward_command_handler(bot, message):
     confirm_btn = [[
         InlineKeyboardButton('✅ Yes, Start', callback_data=f"start_public_{forward_id}"),
         InlineKeyboardButton('❌ No, Cancel', callback_data="close_btn")
+    ], [
+        InlineKeyboardButton('📊 Dry Run Plan', callback_data=f"plan_public_{forward_id}")
     ]]
     
     # Store Data in STS
-    STS(forward_id).store(chat_id, target_chat_id, skip_count, last_msg_id)
+    STS(forward_id).store(chat_id, target_chat_id, skip_count, last_msg_id, start_date, end_date, targets, user_id)
     
     await message.reply_text(
         text=Script.DOUBLE_CHECK.format(
@@ -156,7 +197,7 @@ async def forward_command_handler(bot, message):
             botuname=_bot['username'], 
             from_chat=source_title, 
             to_chat=target_title, 
-            skip=skip_count
+            skip=skip_text
         ),
         disable_web_page_preview=True,
         reply_markup=InlineKeyboardMarkup(confirm_btn)
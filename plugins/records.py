@@ -0,0 +1,113 @@
+from hydrogram import enums, raw, types
+from hydrogram.file_id import FileUniqueId, FileUniqueType
+
+# ==============================================================================
+#  Lightweight Message Records (raw API fast path)
+# ==============================================================================
+
+class Entity:
+    __slots__ = ('type',)
+
+    def __init__(self, type):
+        self.type = type
+
+# Only entities a filter looks at are decoded
+RAW_ENTITIES = {
+    raw.types.MessageEntityUrl: Entity(enums.MessageEntityType.URL),
+    raw.types.MessageEntityTextUrl: Entity(enums.MessageEntityType.TEXT_LINK)
+}
+
+class DocumentRecord:
+    __slots__ = ('file_name', 'file_size', 'file_unique_id')
+
+    def __init__(self, file_name, file_size, file_unique_id):
+        self.file_name = file_name
+        self.file_size = file_size
+        self.file_unique_id = file_unique_id
+
+class MessageRecord:
+    """The fields the filter chain and dedup read, decoded straight from a raw message.
+
+    Attribute names match hydrogram's Message, so filters accept either.
+    `parse()` builds the full Message (once) when it is actually needed.
+    """
+    __slots__ = (
+        'id', 'empty', 'service', 'media', 'text', 'entities', 'caption_entities',
+        'poll', 'document', 'media_group_id', '_client', '_raw', '_peers', '_full'
+    )
+
+    def __init__(self, client, message, peers):
+        self.id = message.id
+        self.empty = isinstance(message, raw.types.MessageEmpty)
+        self.service = isinstance(message, raw.types.MessageService)
+        self.media = self.text = self.entities = self.caption_entities = None
+        self.poll = self.document = None
+        self.media_group_id = getattr(message, 'grouped_id', None)
+        self._client = client
+        self._raw = message
+        self._peers = peers
+        self._full = None
+
+    async def parse(self):
+        if self._full is None:
+            users, chats = self._peers
+            self._full = await types.Message._parse(client=self._client, message=self._raw, users=users, chats=chats, replies=0)
+        return self._full
+
+async def materialize(message):
+    """Full hydrogram Message for a record (Messages pass through)."""
+    return await message.parse() if isinstance(message, MessageRecord) else message
+
+async def decode_messages(client, r):
+    """Records for a raw messages.Messages-like result; unusual media are fully parsed."""
+    peers = ({u.id: u for u in r.users}, {c.id: c for c in r.chats})
+    records = []
+    for message in r.messages:
+        record = MessageRecord(client, message, peers)
+        if isinstance(message, raw.types.Message) and not _decode(record, message):
+            record = await record.parse()
+        records.append(record)
+    return records
+
+def _decode(record, message):
+    """Fills media fields; False if the media type needs hydrogram's full parser."""
+    entities = [RAW_ENTITIES[type(e)] for e in message.entities or () if type(e) in RAW_ENTITIES] or None
+    media = message.media
+    if media is None or isinstance(media, raw.types.MessageMediaEmpty):
+        record.text, record.entities = message.message or None, entities
+        return True
+    if isinstance(media, raw.types.MessageMediaWebPage):
+        record.media = enums.MessageMediaType.WEB_PAGE
+        record.text, record.entities = message.message or None, entities
+        return True
+    record.caption_entities = entities
+    if isinstance(media, raw.types.MessageMediaPhoto) and isinstance(media.photo, raw.types.Photo):
+        record.media = enums.MessageMediaType.PHOTO
+        return True
+    if isinstance(media, raw.types.MessageMediaPoll):
+        record.media = enums.MessageMediaType.POLL
+        record.poll = media.poll
+        return True
+    if isinstance(media, raw.types.MessageMediaDocument) and isinstance(media.document, raw.types.Document):
+        doc = media.document
+        attributes = {type(a): a for a in doc.attributes}
+        # Same precedence as hydrogram's Message._parse
+        if raw.types.DocumentAttributeAnimated in attributes:
+            record.media = enums.MessageMediaType.ANIMATION
+        elif raw.types.DocumentAttributeSticker in attributes:
+            record.media = enums.MessageMediaType.STICKER
+        elif raw.types.DocumentAttributeVideo in attributes:
+            video = attributes[raw.types.DocumentAttributeVideo]
+            record.media = enums.MessageMediaType.VIDEO_NOTE if video.round_message else enums.MessageMediaType.VIDEO
+        elif raw.types.DocumentAttributeAudio in attributes:
+            audio = attributes[raw.types.DocumentAttributeAudio]
+            record.media = enums.MessageMediaType.VOICE if audio.voice else enums.MessageMediaType.AUDIO
+        else:
+            filename = attributes.get(raw.types.DocumentAttributeFilename)
+            record.media = enums.MessageMediaType.DOCUMENT
+            record.document = DocumentRecord(
+                getattr(filename, 'file_name', None), doc.size,
+                FileUniqueId(file_unique_type=FileUniqueType.DOCUMENT, media_id=doc.id).encode()
+            )
+        return True
+    return False
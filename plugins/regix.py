@@ -1,20 +1,32 @@
 
 import os
-import re
 import time
 import math
-import random
 import asyncio
 import logging
-from hydrogram import Client, filters
-from hydrogram.errors import FloodWait, MessageNotModified
+import datetime
+import itertools
+import collections
+from hydrogram import Client, filters, raw, utils
+from hydrogram.errors import MessageNotModified
+from hydrogram.handlers import MessageHandler, EditedMessageHandler, DeletedMessagesHandler
 from hydrogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 from config import Config, Temp
 from script import Script
 from database import db
-from .utils import STS
-from .test import get_client, iter_messages
+from .utils import STS, TASKS
+from .test import iter_messages, iter_shard, iter_search, plan_search_filters, find_id_by_date
+from .pool import POOL
 from .db import connect_user_db
+from .limiter import get_limiter
+from .checkpoint import CHECKPOINT
+from .dedup import DedupIndex, scan_target
+from .filtering import compile_filters
+from .mapping import MAPPING
+from .records import materialize
+from .scheduler import SCHEDULER
+from .supervisor import SUPERVISOR, current_job
+from .hud import HUD
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -34,112 +46,586 @@ TEXT = """
 <b>  ♻️ ᴅᴜᴘ:</b> <code>{}</code> <b>| 🚫 ғɪʟᴛ:</b> <code>{}</code> <b>| 🗑️ sᴋɪᴘ:</b> <code>{}</code>
 """
 
+# Pipeline tuning: each queue holds ~2 fetch batches of read-ahead
+QUEUE_SIZE = 200
+ALBUM_MAX = 10  # Telegram's media group size limit
+SHARD_READAHEAD = 2  # Fetched 100-ID shards buffered per worker
+IDLE_FLUSH = 2  # Seconds a partial batch waits for more messages before it is sent
+MEDIA_CACHE = 500  # Sent file_ids kept for reuse by the other targets
+LIVE_GROUPS = itertools.count(100)  # One handler group per live (mirror/sync) task
+END = object()  # End-of-stream marker passed between stages
+ALBUM_BUTTON_TEXT = "⬆️"  # Body of the message that carries an album's buttons
+
+class StageError:
+    """Stream marker: an upstream stage failed. The sender re-raises `error`, so the job fails instead of completing."""
+    __slots__ = ('error',)
+
+    def __init__(self, error):
+        self.error = error
+
 @Client.on_callback_query(filters.regex(r'^start_public'))
 async def start_public_forward(bot, query):
     user_id = query.from_user.id
-    Temp.CANCEL[user_id] = False
-    if Temp.LOCK.get(user_id): return await query.answer("Wait for current task!", show_alert=True)
-
     frwd_id = query.data.split("_")[2]
     sts = STS(frwd_id)
     if not sts.verify(): return await query.message.delete()
 
-    m = await msg_edit(query.message, "<code>Verifying...</code>")
+    m = query.message
     _bot, caption, forward_tag, datas, protect, button = await sts.get_data(user_id)
-    
-    if not _bot: return await msg_edit(m, "<code>No Client Found!</code>", wait=True)
+    if not _bot: return await msg_edit(m, "<code>No Client Found!</code>")
+
+    if SCHEDULER.has_job(frwd_id): return await query.answer("This task is already queued or running.", show_alert=True)
+    # The scheduler starts it now or once a slot frees up
+    docs = await db.get_workers(user_id) if datas.get('sharding') else [_bot]
+    position = await SCHEDULER.submit(user_id, frwd_id, sts.params(), [doc['id'] for doc in docs], m)
+    if position is None: return await query.answer("Queue full! Wait for your queued jobs to start.", show_alert=True)
+    if position:
+        await msg_edit(m, f"<b>⏳ Queued</b> (position <code>{position}</code>)\nIt starts automatically when a slot is free.",
+                       InlineKeyboardMarkup([[InlineKeyboardButton('🗑 Leave Queue', f'dequeue_{frwd_id}')]]))
+
+async def run_job(bot, job, status_msg=None):
+    """Scheduler entry point: runs one job taken off the queue."""
+    user_id = job['user_id']
+    Temp.CANCEL[user_id] = False
+    sts = STS(job['_id'])
+    # Queued before a restart: rebuild the task from the stored job
+    if not sts.verify(): sts.store(**job['sts'])
+    if status_msg is None:
+        try: status_msg = await bot.send_message(user_id, "<code>Starting queued job...</code>")
+        except Exception: return logger.warning(f"Job {job['_id']} dropped: cannot message {user_id}")
+
+    await msg_edit(status_msg, "<code>Verifying...</code>")
+    _bot, caption, forward_tag, datas, protect, button = await sts.get_data(user_id)
+    if not _bot: return await msg_edit(status_msg, "<code>No Client Found!</code>")
 
-    try:
-        is_bot_client = _bot.get('is_bot', False)
-        client = await get_client(_bot['token'] if is_bot_client else _bot['session'], is_bot=is_bot_client)
-        await client.start()
-    except Exception as e: return await m.edit(f"Error: {e}")
+    try: workers = await start_workers(user_id, _bot, datas)
+    except Exception as e: return await msg_edit(status_msg, f"Error: {e}")
 
-    await run_forward_logic(bot, client, user_id, m, sts, datas, forward_tag, caption, protect, button, is_bot_client)
+    await run_forward_logic(bot, workers, user_id, status_msg, sts, datas, forward_tag, caption, protect, button)
 
-async def run_forward_logic(main_bot, worker_client, user_id, status_msg, sts, datas, forward_tag, caption, protect, button, is_bot_client, is_restart=False):
+@Client.on_callback_query(filters.regex(r'^dequeue_'))
+async def dequeue_handler(bot, query):
+    if await SCHEDULER.cancel(query.from_user.id, query.data.split("_", 1)[1]):
+        return await msg_edit(query.message, "<b>🗑 Removed from queue.</b>")
+    await query.answer("Already started or no longer queued.", show_alert=True)
+
+async def start_workers(user_id, _bot, datas):
+    """Starts the task's worker clients: every linked account when sharding, else just `_bot`."""
+    docs = await db.get_workers(user_id) if datas.get('sharding') else [_bot]
+    workers = []
+    try:
+        for doc in docs:
+            is_bot = doc.get('is_bot', False)
+            workers.append(await POOL.acquire(doc['token'] if is_bot else doc['session'], is_bot=is_bot))
+    except Exception:
+        for client in workers: await POOL.release(client)
+        raise
+    return workers
+
+async def run_forward_logic(main_bot, workers, user_id, status_msg, sts, datas, forward_tag, caption, protect, button, is_restart=False):
+    # The scheduler admits one job per target chat; this guards the registry for resumed tasks too
+    if not TASKS.activate(sts.id, user_id):
+        for client in workers: await POOL.release(client)
+        # The notify document stays, so a refused resumed task is retried on the next boot
+        text = "<b>⚠️ Another task is already forwarding into this chat.</b>\nThis task was not started."
+        return await (msg_edit(status_msg, text) if status_msg else send_msg(main_bot, user_id, text))
+    interrupted = False
     try:
         if not is_restart: await msg_edit(status_msg, "<code>Processing...</code>")
         
-        user_have_db = False; user_db = None; dup_files = []
+        user_have_db = False; user_db = None
         if datas['db_uri']:
             connected, user_db = await connect_user_db(user_id, datas['db_uri'], sts.get("TO"))
-            if connected:
-                user_have_db = True
-                if datas.get('skip_duplicate'):
-                    async for ofile in await user_db.get_all_files(): dup_files.append(ofile["file_id"])
-
+            if connected: user_have_db = True
+        dup_index = DedupIndex(user_db if user_have_db else None)
+        if datas.get('skip_duplicate'): await dup_index.load()
+        # Keys of files already in the target; one index can't serve several targets
+        if datas.get('skip_duplicate') and datas.get('prescan') and len(sts.get("TARGETS") or [sts.get("TO")]) == 1:
+            await msg_edit(status_msg, "<code>Scanning target...</code>")
+            await scan_target(workers, sts.get("TO"), dup_index)
+        chain = compile_filters(datas)
+        # Userbots can let the server drop excluded media types before they are sent to us
+        search_filters = None if len(workers) > 1 or workers[0].me.is_bot else plan_search_filters(datas['filters'])
+
+        if not is_restart and (sts.get('start_date') or sts.get('end_date')):
+            await msg_edit(status_msg, "<code>Locating date range...</code>")
+            await resolve_date_bounds(workers[0], sts)
+
+        Temp.FORWARDINGS += 1
         if not is_restart:
-            Temp.FORWARDINGS += 1
             await db.add_frwd(user_id)
             await send_msg(main_bot, user_id, "<b>🔥 Forwarding Started</b>")
             sts.add(time=True)
-
-        Temp.IS_FRWD_CHAT.append(sts.get("TO"))
-        Temp.LOCK[user_id] = True
-        
-        keywords = "|".join(datas['keywords']) if datas['keywords'] else None
-        extensions = "|".join(datas['extensions']) if datas['extensions'] else None
+            await update_forward_db(user_id, sts.get(full=True))
+        CHECKPOINT.start(user_id, sts.get(full=True))
         
-        MSG_BATCH = []
-        progress_counter = 0
         await edit_status(user_id, status_msg, 'Starting', 5, sts)
 
-        async for message in iter_messages(worker_client, sts.get("FROM"), sts.get("limit"), sts.get("skip"), datas['filters'], datas['max_size']):
-            if await is_cancelled(main_bot, user_id, status_msg, sts): break
+        # Fetch -> Filter -> Send, joined by bounded queues so the next
+        # get_messages batch is already in memory while the sender drains.
+        fetched_q = asyncio.Queue(maxsize=QUEUE_SIZE)
+        send_q = asyncio.Queue(maxsize=QUEUE_SIZE)
+        fan = FanOut(sts, sts.get("TARGETS") or [sts.get("TO")], dup_index)
+        stages = [
+            asyncio.create_task(fetch_stage(workers, sts, search_filters, fetched_q, user_id, datas.get('mirror'))),
+            asyncio.create_task(filter_stage(user_id, status_msg, sts, datas, chain, fetched_q, send_q, dup_index, 'filtered' if search_filters else 'deleted')),
+        ]
+        # Several targets: fetch and filter once, then one send queue per target
+        target_qs = [send_q]
+        if len(fan.targets) > 1:
+            target_qs = [asyncio.Queue(maxsize=QUEUE_SIZE) for _ in fan.targets]
+            stages.append(asyncio.create_task(fanout_stage(send_q, target_qs)))
+        if datas.get('sync'):
+            stages.append(asyncio.create_task(sync_stage(workers, sts, forward_tag, caption, button)))
+        senders = [
+            asyncio.create_task(send_stage(main_bot, workers, user_id, status_msg, sts, target_q, forward_tag, caption, protect, button, fan, target, is_restart))
+            for target, target_q in zip(fan.targets, target_qs)
+        ]
+        try:
+            completed = all(await asyncio.gather(*senders))
+        finally:
+            # One failed target (or a cancel) stops the other senders too
+            for task in senders + stages: task.cancel()
+            await asyncio.gather(*senders, *stages, return_exceptions=True)
+
+        if chain.summary(): logger.info(f"Task {sts.id} filter hits: {chain.summary()}")
+        if completed:
+            report = f"\n<b>🚫 Filtered:</b> <code>{chain.summary()}</code>" if chain.summary() else ""
+            await send_msg(main_bot, user_id, f"<b>🎉 Completed!</b>{report}")
+            await edit_status(user_id, status_msg, 'Completed', "completed", sts)
+
+    except asyncio.CancelledError:
+        job = current_job()
+        if job is None or job.reason in (None, 'shutdown'):
+            # Shutdown: keep the notify document so the task resumes on next boot
+            interrupted = True
+            raise
+        # Stopped by the user or the job timeout: report it like any cancel
+        Temp.CANCEL[user_id] = True
+        await is_cancelled(main_bot, user_id, status_msg, sts)
+    except Exception as e:
+        logger.error(f"Loop Error: {e}")
+        await msg_edit(status_msg, f'<b>ERROR:</b>\n<code>{e}</code>')
+    finally:
+        TASKS.finish(sts.id)
+        if user_have_db and user_db:
+            try: await user_db.close()
+            except: pass
+        if sts.get(full=True): CHECKPOINT.record(user_id, sts.get(full=True))
+        await CHECKPOINT.close(user_id)
+        await MAPPING.flush()
+        await stop_process(workers, user_id, keep_task=interrupted)
+
+async def resolve_date_bounds(client, sts):
+    """Turns the task's start/end dates into source message IDs."""
+    offset, limit = sts.get('offset'), sts.get('limit')
+    if sts.get('end_date'):
+        # End date is inclusive: stop before the first post of the next day
+        limit = await find_id_by_date(client, sts.get('FROM'), sts.get('end_date') + datetime.timedelta(days=1), limit) - 1
+    if sts.get('start_date'):
+        offset = max(offset, await find_id_by_date(client, sts.get('FROM'), sts.get('start_date'), limit))
+    sts.bound(offset, limit)
+
+# --- Pipeline Stages ---
+async def fetch_stage(workers, sts, search_filters, out_q, user_id=None, mirror=False):
+    """Reads ahead from the source; blocks once `out_q` is full (backpressure).
+
+    With `mirror`, keeps feeding new source posts after the backlog is drained.
+    """
+    try:
+        if search_filters:
+            async for message in iter_search(workers[0], sts.get("FROM"), sts.get("limit"), sts.get("offset"), search_filters):
+                await out_q.put(message)
+        elif len(workers) == 1:
+            async for message in iter_messages(workers[0], sts.get("FROM"), sts.get("limit"), sts.get("offset")):
+                await out_q.put(message)
+        else:
+            await sharded_fetch(workers, sts, out_q)
+        if mirror and not Temp.CANCEL.get(user_id):
+            await live_feed(workers[0], sts, user_id, out_q)
+    except Exception as e:
+        logger.error(f"Fetch Error: {e}")
+        return await out_q.put(StageError(e))
+    await out_q.put(END)
+
+async def live_feed(worker, sts, user_id, out_q):
+    """Mirror mode: forwards new source posts as they arrive, until cancelled.
+
+    Anything posted while nobody was listening (e.g. during a restart) is
+    fetched from the high-water mark as soon as the next live post shows up.
+    """
+    live_q = asyncio.Queue()
+    async def on_post(client, message): live_q.put_nowait(message)
+
+    group = next(LIVE_GROUPS)
+    handler = MessageHandler(on_post, filters.chat(sts.get("FROM")))
+    worker.add_handler(handler, group)
+    next_id = max(sts.get("offset"), sts.get("limit") + 1)
+    try:
+        while not Temp.CANCEL.get(user_id):
+            try: message = await asyncio.wait_for(live_q.get(), 5)
+            except asyncio.TimeoutError: continue
+            if message.id < next_id: continue
+            if message.id > next_id:
+                async for missed in iter_messages(worker, sts.get("FROM"), message.id - 1, next_id):
+                    await out_q.put(missed)
+            await out_q.put(message)
+            next_id = message.id + 1
+    finally:
+        worker.remove_handler(handler, group)
+
+async def sync_stage(workers, sts, forward_tag, caption, button):
+    """Sync mode: re-applies source edits and deletions to the copies already sent.
+
+    Lasts as long as the task (with mirror, until cancelled). Copies are
+    found through the message map and changed by the account that sent
+    them. Forwards cannot be edited, and bots are not told about deletions,
+    so those need copies and a userbot worker respectively.
+    """
+    accounts = {client.me.id: client for client in workers}
+
+    async def on_edit(client, message):
+        if forward_tag or message.empty: return
+        for doc in await MAPPING.lookup(sts.get("FROM"), [message.id]):
+            sender = accounts.get(doc['a'])
+            if not sender: continue
+            limiter = get_limiter(sender, doc['t'])
+            try:
+                if message.text:
+                    await limiter.call(sender.edit_message_text, doc['t'], doc['m'], message.text.html, reply_markup=button)
+                elif message.media:
+                    await limiter.call(sender.edit_message_caption, doc['t'], doc['m'], custom_caption(message, caption) or "", reply_markup=button)
+            except MessageNotModified: pass
+            except Exception as e: logger.warning(f"Sync edit failed for {doc['t']}/{doc['m']}: {e}")
+
+    async def on_delete(client, messages):
+        msg_ids = [message.id for message in messages]
+        by_sender = {}
+        for doc in await MAPPING.lookup(sts.get("FROM"), msg_ids):
+            by_sender.setdefault((doc['a'], doc['t']), []).append(doc['m'])
+        for (account_id, chat_id), target_ids in by_sender.items():
+            sender = accounts.get(account_id)
+            if not sender: continue
+            try: await get_limiter(sender, chat_id).call(sender.delete_messages, chat_id, target_ids)
+            except Exception as e: logger.warning(f"Sync delete failed for {chat_id}: {e}")
+        await MAPPING.forget(sts.get("FROM"), msg_ids)
+
+    # One listener is enough; prefer a userbot since only it sees deletions
+    worker = next((client for client in workers if not client.me.is_bot), workers[0])
+    group = next(LIVE_GROUPS)
+    handlers = [
+        EditedMessageHandler(on_edit, filters.chat(sts.get("FROM"))),
+        DeletedMessagesHandler(on_delete, filters.chat(sts.get("FROM")))
+    ]
+    for handler in handlers: worker.add_handler(handler, group)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        for handler in handlers: worker.remove_handler(handler, group)
+
+async def sharded_fetch(workers, sts, out_q):
+    """Splits the ID range into 100-ID shards striped across workers.
+
+    Each worker fetches its shards under its own rate limit; the sequencer
+    below drains the shard queues round-robin, so messages reach `out_q`
+    in source order.
+    """
+    n = len(workers)
+    shard_qs = [asyncio.Queue(maxsize=SHARD_READAHEAD) for _ in workers]
+    readers = [
+        asyncio.create_task(_shard_reader(client, sts, index, n, shard_qs[index]))
+        for index, client in enumerate(workers)
+    ]
+    try:
+        index = 0
+        while True:
+            batch = await shard_qs[index % n].get()
+            if batch is END: break
+            # A failed reader would leave a hole in the range: fail the fetch instead
+            if isinstance(batch, StageError): raise batch.error
+            for message in batch: await out_q.put(message)
+            index += 1
+    finally:
+        for task in readers: task.cancel()
+        await asyncio.gather(*readers, return_exceptions=True)
+
+async def _shard_reader(client, sts, index, n, out_q):
+    try:
+        async for batch in iter_shard(client, sts.get("FROM"), sts.get("limit"), sts.get("offset"), index, n):
+            await out_q.put(batch)
+    except Exception as e:
+        logger.error(f"Shard {index} Error: {e}")
+        return await out_q.put(StageError(e))
+    await out_q.put(END)
+
+async def filter_stage(user_id, status_msg, sts, datas, chain, in_q, out_q, dup_index, gap_key='deleted'):
+    """Drops filtered, deleted and duplicate messages; passes the rest to the sender."""
+    progress_counter = 0
+    last_id = sts.get("offset") - 1
+    try:
+        while True:
+            message = await in_q.get()
+            if isinstance(message, StageError): return await out_q.put(message)
+            if message is END or Temp.CANCEL.get(user_id): break
 
             if progress_counter % 20 == 0: await edit_status(user_id, status_msg, 'Running', 5, sts)
             progress_counter += 1
             sts.add('fetched')
+            # IDs skipped server-side: deleted (history) or excluded types (search)
+            gap = message.id - last_id - 1
+            if gap > 0: sts.add('fetched', gap); sts.add(gap_key, gap)
+            last_id = max(last_id, message.id)
 
-            if message in ["DUPLICATE", "FILTERED"]: sts.add(message.lower()); continue
             if not message or message.empty or message.service: sts.add('deleted'); continue
-            
+            if chain.reject(message): sts.add('filtered'); continue
+
             if message.document:
-                if await extension_filter(extensions, message.document.file_name): sts.add('filtered'); continue
-                if await keyword_filter(keywords, message.document.file_name): sts.add('filtered'); continue
-                if await size_filter(datas['max_size'], datas['min_size'], message.document.file_size): sts.add('filtered'); continue
-                if message.document.file_id in dup_files: sts.add('duplicate'); continue
                 if datas['skip_duplicate']:
-                    dup_files.append(message.document.file_id)
-                    if user_have_db: await user_db.add_file(message.document.file_id)
-
-            if forward_tag:
-                MSG_BATCH.append(message.id)
-                if len(MSG_BATCH) >= 100:
-                    await forward_messages_safe(user_id, worker_client, MSG_BATCH, status_msg, sts, protect)
-                    sts.add('total_files', len(MSG_BATCH))
-                    await asyncio.sleep(random.randint(10, 15)) # Batch ke baad 10-15s delay
-                    MSG_BATCH = []
-            else:
-                new_caption = custom_caption(message, caption)
-                details = {"msg_id": message.id, "media": get_media_id(message), "caption": new_caption, 'button': button, "protect": protect}
-                await copy_message_safe(user_id, worker_client, details, status_msg, sts)
-                sts.add('total_files')
-                
-                # --- ULTRA SAFE DELAY (Sending) ---
-                # 4 se 10 second ka random delay har message ke baad
-                await asyncio.sleep(random.uniform(4, 10)) 
-
-        if MSG_BATCH:
-             await forward_messages_safe(user_id, worker_client, MSG_BATCH, status_msg, sts, protect)
-             sts.add('total_files', len(MSG_BATCH))
-
-        await send_msg(main_bot, user_id, "<b>🎉 Completed!</b>")
-        await edit_status(user_id, status_msg, 'Completed', "completed", sts)
+                    key = message.document.file_unique_id
+                    if await dup_index.check(key): sts.add('duplicate'); continue
+                    dup_index.hold(message.id, key)
 
+            await out_q.put(message)
     except Exception as e:
-        logger.error(f"Loop Error: {e}")
-        await msg_edit(status_msg, f'<b>ERROR:</b>\n<code>{e}</code>', wait=True)
+        logger.error(f"Filter Error: {e}")
+        return await out_q.put(StageError(e))
+    await out_q.put(END)
+
+class FanOut:
+    """Shared state of a task's per-target senders (one source scan, many targets)."""
+
+    def __init__(self, sts, targets, dup_index=None):
+        self.sts = sts
+        self.targets = targets
+        self.dup_index = dup_index
+        self.progress = {target: sts.get('offset') for target in targets}
+        self.media = {}  # source msg id -> [worker, file_id, targets left] stored by the first target
+
+    async def commit(self, target, offset):
+        # Resume point is the slowest target's position
+        self.progress[target] = offset
+        offset = min(self.progress.values())
+        self.sts.commit(offset)
+        if self.dup_index: await self.dup_index.commit(offset)
+
+    def store_media(self, source_id, worker, sent):
+        file_id = get_media_id(sent) if sent else None
+        if file_id and len(self.targets) > 1:
+            self.media[source_id] = [worker, file_id, len(self.targets) - 1]
+            # Bounded: drop the oldest entries if a lagging target never claims them
+            while len(self.media) > MEDIA_CACHE: del self.media[next(iter(self.media))]
+
+    def cached_media(self, source_id, worker):
+        entry = self.media.get(source_id)
+        if not entry or entry[0] is not worker: return None
+        entry[2] -= 1
+        if entry[2] <= 0: del self.media[source_id]
+        return entry[1]
+
+async def fanout_stage(in_q, out_qs):
+    """Copies every filtered message to each target's send queue."""
+    while True:
+        message = await in_q.get()
+        for out_q in out_qs: await out_q.put(message)
+        if message is END or isinstance(message, StageError): return
+
+class SendWindow:
+    """Single copies to one target, published strictly in source order.
+
+    Telegram numbers posts in the order it applies them, and concurrent sends
+    can be applied out of order, so copy N+1 starts only once copy N is
+    acknowledged (serialized commits). The rest overlaps with the copy on
+    the wire: committing the previous copy (progress, counters, media cache,
+    dedup keys) and preparing the next message.
+    """
+
+    def __init__(self, send, on_commit):
+        self.send = send
+        self.on_commit = on_commit
+        self.pending = collections.deque()  # (message_id, worker, task) in source order; only the last may be sending
+
+    async def submit(self, message_id, worker, details):
+        previous = self.pending[-1][2] if self.pending else None
+        task = asyncio.create_task(self._send_after(previous, worker, details))
+        self.pending.append((message_id, worker, task))
+        # Everything before the new copy is acknowledged (or about to be): commit it
+        while len(self.pending) > 1: await self._commit_head()
+
+    async def drain(self):
+        while self.pending: await self._commit_head()
+
+    async def abort(self):
+        """Cancels the copy still in flight, uncommitted (the stage is stopping)."""
+        tasks = [task for *_, task in self.pending]
+        self.pending.clear()
+        for task in tasks: task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _send_after(self, previous, worker, details):
+        if previous: await asyncio.wait([previous])
+        return await self.send(worker, details)
+
+    async def _commit_head(self):
+        message_id, worker, task = self.pending[0]
+        sent = await task
+        self.pending.popleft()
+        await self.on_commit(message_id, worker, sent)
+
+async def send_stage(main_bot, workers, user_id, status_msg, sts, in_q, forward_tag, caption, protect, button, fan=None, target=None, resume=False):
+    """Sends to one target in source order, rotating calls across workers. Returns False if cancelled.
+
+    Messages go out in batches of up to 100 per call (forward, or copy via
+    drop_author); only those needing a custom caption or buttons are copied
+    one by one. Media groups are never split: in batches they stay inside
+    one call, and with custom captions each album goes out as one
+    SendMultiMedia. Albums cannot carry buttons, so a short message with
+    the buttons follows the album.
+
+    On `resume`, IDs the message map shows as already delivered to this
+    target (sent after the last checkpoint) are skipped.
+    """
+    fan = fan or FanOut(sts, [sts.get('TO')])
+    target = target or fan.targets[0]
+    primary = target == fan.targets[0]
+    delivered = await MAPPING.sent_ids(sts.get('FROM'), target, sts.get('offset'), sts.get('limit')) if resume else set()
+    MSG_BATCH = []
+    ALBUM = []
+    batch_group = None
+    turn = 0
+
+    async def send_one(worker, details):
+        return await copy_message_safe(user_id, worker, details, status_msg, sts, target)
+
+    async def committed(message_id, worker, sent):
+        if primary:
+            fan.store_media(message_id, worker, sent)
+            sts.add('total_files')
+        await fan.commit(target, message_id + 1)
+
+    window = SendWindow(send_one, committed)
+
+    async def flush():
+        nonlocal MSG_BATCH, batch_group, turn
+        if not MSG_BATCH: return
+        await window.drain()
+        worker = workers[turn % len(workers)]
+        if forward_tag: await forward_messages_safe(user_id, worker, MSG_BATCH, status_msg, sts, protect, target)
+        else: await copy_messages_safe(user_id, worker, MSG_BATCH, status_msg, sts, protect, target)
+        if primary: sts.add('total_files', len(MSG_BATCH))
+        await fan.commit(target, MSG_BATCH[-1] + 1)
+        MSG_BATCH = []; batch_group = None
+        turn += 1
+
+    async def flush_album():
+        nonlocal ALBUM, turn
+        if not ALBUM: return
+        await window.drain()
+        # file_ids are only valid for the account that fetched them
+        worker = ALBUM[0]._client if ALBUM[0]._client in workers else workers[turn % len(workers)]
+        captions = [custom_caption(m, caption) for m in ALBUM]
+        await copy_album_safe(user_id, worker, ALBUM, captions, status_msg, sts, protect, target, button)
+        if primary: sts.add('total_files', len(ALBUM))
+        await fan.commit(target, ALBUM[-1].id + 1)
+        ALBUM = []
+        turn += 1
+
+    try:
+        while True:
+            if (MSG_BATCH or ALBUM or window.pending) and in_q.empty():
+                # Nothing queued behind the pending batch (e.g. mirror mode): don't hold it back
+                try: message = await asyncio.wait_for(in_q.get(), IDLE_FLUSH)
+                except asyncio.TimeoutError:
+                    await window.drain(); await flush_album(); await flush()
+                    CHECKPOINT.record(user_id, sts.get(full=True))
+                    continue
+            else:
+                message = await in_q.get()
+            cancelled = await is_cancelled(main_bot, user_id, status_msg, sts) if primary else Temp.CANCEL.get(user_id)
+            if cancelled:
+                await window.drain()
+                return False
+            if message is END: break
+            if isinstance(message, StageError):
+                # Send what is already in flight, then fail the job
+                await window.drain(); await flush_album(); await flush()
+                raise message.error
+            if message.id in delivered:
+                if primary: sts.add('total_files')
+                continue
+
+            group = message.media_group_id
+            if ALBUM and group != ALBUM[0].media_group_id: await flush_album()
+
+            if forward_tag or not (button or (caption and message.media)):
+                await flush_album()
+                if group is None or group != batch_group:
+                    # New post: make room so an album never straddles two calls
+                    if len(MSG_BATCH) > 100 - (ALBUM_MAX if group else 1): await flush()
+                MSG_BATCH.append(message.id)
+                batch_group = group
+                continue
+
+            await flush()
+            # Only messages copied one by one need the full parse (file_id, caption)
+            message = await materialize(message)
+            if group is not None:
+                ALBUM.append(message)
+                continue
+
+            worker = workers[turn % len(workers)]
+            new_caption = custom_caption(message, caption)
+            if primary: media = get_media_id(message) if message._client is worker else None
+            # Later targets reuse the file the first target already stored
+            else: media = fan.cached_media(message.id, worker)
+            details = {"msg_id": message.id, "media": media, "caption": new_caption, 'button': button, "protect": protect}
+            await window.submit(message.id, worker, details)
+            turn += 1
+
+        await window.drain()
+        await flush_album()
+        await flush()
+        return True
     finally:
-        if sts.get("TO") in Temp.IS_FRWD_CHAT: Temp.IS_FRWD_CHAT.remove(sts.get("TO"))
-        if user_have_db and user_db:
-            try: await user_db.close()
-            except: pass
-        await stop_process(worker_client, user_id)
+        # Copies still in flight were never committed; stop them on cancel or error
+        await window.abort()
 
 async def restart_forwards(client):
-    pass 
+    """Resumes every task left in the notify collection by the previous process."""
+    pending = []
+    async for task in await db.get_all_frwd():
+        details = task.get('details')
+        if not details or not details.get('chat_id'):
+            await db.rmve_frwd(task['user_id']); continue
+        pending.append((task['user_id'], details.get('targets') or [details.get('toid')]))
+
+    if pending: logger.info(f"Resuming {len(pending)} forward task(s)")
+    for user_id, targets in pending:
+        # Hold the user's slot and target chats before queued jobs are admitted below
+        SCHEDULER.track(user_id, [], targets=targets)
+        SUPERVISOR.launch(f"resume:{user_id}", resume_forward(client, user_id), owner=user_id, kind='forward', timeout=Config.JOB_TIMEOUT or None)
+    await SCHEDULER.setup(client, run_job)
+
+async def resume_forward(bot, user_id):
+    try:
+        Temp.CANCEL[user_id] = False
+        sts = STS(await store_vars(user_id))
+        _bot, caption, forward_tag, datas, protect, button = await sts.get_data(user_id)
+        if not _bot:
+            await db.rmve_frwd(user_id)
+            return await send_msg(bot, user_id, "<b>⚠️ Task Dropped:</b> No Bot/Userbot found to resume it.")
+
+        try: workers = await start_workers(user_id, _bot, datas)
+        except Exception as e:
+            logger.error(f"Resume failed for {user_id}: {e}")
+            await db.rmve_frwd(user_id)
+            return await send_msg(bot, user_id, f"<b>⚠️ Task Dropped:</b> <code>{e}</code>")
+        SCHEDULER.track(user_id, [client.me.id for client in workers], sts.id)
+
+        try: status_msg = await bot.send_message(user_id, "<b>♻️ Resuming Forwarding...</b>")
+        except Exception: status_msg = None
+        await run_forward_logic(bot, workers, user_id, status_msg, sts, datas, forward_tag, caption, protect, button, is_restart=True)
+    finally:
+        await SCHEDULER.release(user_id)
 
 # --- Helpers ---
 def TimeFormatter(milliseconds: int) -> str:
@@ -150,9 +636,10 @@ def TimeFormatter(milliseconds: int) -> str:
     return ((str(days) + "d ") if days else "") + ((str(hours) + "h ") if hours else "") + ((str(minutes) + "m ") if minutes else "") + ((str(seconds) + "s") if seconds else "") or "0s"
 
 async def edit_status(user, msg, title, status, sts):
-    if not msg: return
     i = sts.get(full=True)
-    try: percentage = int((i.fetched * 100) / i.total) if i.total > 0 else 0
+    CHECKPOINT.record(user, i)
+    if not msg: return
+    try: percentage = min(100, int((i.fetched * 100) / i.total)) if i.total > 0 else 0
     except: percentage = 0
     filled = int(percentage / 10)
     bar = f"{'▰' * filled}{'▱' * (10 - filled)}"
@@ -161,56 +648,112 @@ async def edit_status(user, msg, title, status, sts):
     eta = TimeFormatter(int(remaining / speed) * 1000) if speed > 0 else "Calc..."
     
     text = TEXT.format(bar, percentage, f"{i.fetched} / {i.total_files}", eta, f"{speed:.1f} msg/s", i.duplicate, i.filtered, i.deleted + i.skip)
-    await update_forward_db(user, i)
     
+    final = status in ["cancelled", "completed"]
     btn = [[InlineKeyboardButton(f"⚡ {percentage}% | {status}", 'fwrdstatus')]]
-    if status in ["cancelled", "completed"]: btn.append([InlineKeyboardButton('✅ Done', url='https://t.me/VJ_Botz')])
+    if final: btn.append([InlineKeyboardButton('✅ Done', url='https://t.me/VJ_Botz')])
     else: btn.append([InlineKeyboardButton('🛑 Stop', 'terminate_frwd')])
-    await msg_edit(msg, text, InlineKeyboardMarkup(btn))
+    HUD.publish(msg, text, InlineKeyboardMarkup(btn), final=final)
 
-async def copy_message_safe(user, bot, msg, m, sts):
+async def copy_message_safe(user, bot, msg, m, sts, to=None):
+    """Copies one message; returns the sent message (None on failure)."""
+    to = to or sts.get('TO')
+    limiter = get_limiter(bot, to)
     try:
         if msg.get("media") and msg.get("caption"):
-            await bot.send_cached_media(chat_id=sts.get('TO'), file_id=msg.get("media"), caption=msg.get("caption"), reply_markup=msg.get('button'), protect_content=msg.get("protect"))
+            sent = await limiter.call(bot.send_cached_media, chat_id=to, file_id=msg.get("media"), caption=msg.get("caption"), reply_markup=msg.get('button'), protect_content=msg.get("protect"))
         else:
-            await bot.copy_message(chat_id=sts.get('TO'), from_chat_id=sts.get('FROM'), caption=msg.get("caption"), message_id=msg.get("msg_id"), reply_markup=msg.get('button'), protect_content=msg.get("protect"))
-    except FloodWait as e:
-        wait = e.value + random.randint(5, 10)
-        await asyncio.sleep(wait)
-        await copy_message_safe(user, bot, msg, m, sts)
-    except Exception: sts.add('deleted')
-
-async def forward_messages_safe(user, bot, msg_ids, m, sts, protect):
+            sent = await limiter.call(bot.copy_message, chat_id=to, from_chat_id=sts.get('FROM'), caption=msg.get("caption"), message_id=msg.get("msg_id"), reply_markup=msg.get('button'), protect_content=msg.get("protect"))
+    except Exception:
+        sts.add('deleted')
+        return None
+    record_sent(bot, sts, to, [(msg.get("msg_id"), sent.id)])
+    return sent
+
+async def forward_messages_safe(user, bot, msg_ids, m, sts, protect, to=None):
+    to = to or sts.get('TO')
+    sent = await get_limiter(bot, to).call(bot.forward_messages, chat_id=to, from_chat_id=sts.get('FROM'), protect_content=protect, message_ids=msg_ids)
+    # One result per forwarded ID, in order; anything else can't be paired safely
+    if isinstance(sent, list) and len(sent) == len(msg_ids):
+        record_sent(bot, sts, to, [(msg_id, message.id) for msg_id, message in zip(msg_ids, sent)])
+
+async def copy_messages_safe(user, bot, msg_ids, m, sts, protect, to=None):
+    """Copies up to 100 messages in one call: a forward with the author header dropped."""
+    to = to or sts.get('TO')
+    random_ids = [bot.rnd_id() for _ in msg_ids]
+    async def forward_copy():
+        return await bot.invoke(raw.functions.messages.ForwardMessages(
+            from_peer=await bot.resolve_peer(sts.get('FROM')),
+            to_peer=await bot.resolve_peer(to),
+            id=msg_ids,
+            random_id=random_ids,
+            drop_author=True,
+            noforwards=protect or None
+        ))
+    try:
+        updates = await get_limiter(bot, to).call(forward_copy)
+        record_sent(bot, sts, to, sent_pairs(updates, random_ids, msg_ids))
+    except Exception as e:
+        # One bad message fails the whole batch; retry those one by one
+        logger.warning(f"Batch copy failed ({e}), falling back to single copies")
+        for msg_id in msg_ids:
+            await copy_message_safe(user, bot, {"msg_id": msg_id, "protect": protect}, m, sts, to)
+
+async def copy_album_safe(user, bot, album, captions, m, sts, protect, to=None, button=None):
+    """Sends a media group as one album, with a custom caption per item.
+
+    SendMultiMedia takes no reply markup, so `button` goes out as its own
+    message right after the album.
+    """
+    to = to or sts.get('TO')
+    random_ids = [bot.rnd_id() for _ in album]
+    async def send_album():
+        multi_media = []
+        for message, text, random_id in zip(album, captions, random_ids):
+            multi_media.append(raw.types.InputSingleMedia(
+                media=utils.get_input_media_from_file_id(get_media_id(message)),
+                random_id=random_id,
+                **await bot.parser.parse(text or "")
+            ))
+        return await bot.invoke(raw.functions.messages.SendMultiMedia(
+            peer=await bot.resolve_peer(to),
+            multi_media=multi_media,
+            noforwards=protect or None
+        ))
     try:
-        await bot.forward_messages(chat_id=sts.get('TO'), from_chat_id=sts.get('FROM'), protect_content=protect, message_ids=msg_ids)
-    except FloodWait as e:
-        await asyncio.sleep(e.value + 5)
-        await forward_messages_safe(user, bot, msg_ids, m, sts, protect)
+        updates = await get_limiter(bot, to).call(send_album)
+        record_sent(bot, sts, to, sent_pairs(updates, random_ids, [message.id for message in album]))
+    except Exception as e:
+        logger.warning(f"Album copy failed ({e}), falling back to single copies")
+        for message, text in zip(album, captions):
+            await copy_message_safe(user, bot, {"msg_id": message.id, "caption": text, 'button': button, "protect": protect}, m, sts, to)
+        return
+    if button:
+        try: await get_limiter(bot, to).call(bot.send_message, to, ALBUM_BUTTON_TEXT, reply_markup=button, protect_content=protect)
+        except Exception as e: logger.warning(f"Album buttons skipped for {to}: {e}")
+
+def record_sent(bot, sts, to, pairs):
+    """Adds delivered (source id, target id) pairs to the message map."""
+    if pairs: MAPPING.record(sts.get('FROM'), to, bot.me.id, pairs)
+
+def sent_pairs(updates, random_ids, source_ids):
+    """Pairs source IDs with the target IDs Telegram assigned, matched by random_id."""
+    assigned = {u.random_id: u.id for u in getattr(updates, 'updates', []) if isinstance(u, raw.types.UpdateMessageID)}
+    return [(source_id, assigned[random_id]) for source_id, random_id in zip(source_ids, random_ids) if random_id in assigned]
 
 async def is_cancelled(client, user, msg, sts):
     if Temp.CANCEL.get(user):
-        if sts.get("TO") in Temp.IS_FRWD_CHAT: Temp.IS_FRWD_CHAT.remove(sts.get("TO"))
         if msg: await edit_status(user, msg, 'Cancelled', "cancelled", sts)
         await send_msg(client, user, "<b>❌ Cancelled</b>")
-        await stop_process(client, user)
         return True
     return False
 
-async def stop_process(client, user):
-    try: await client.stop()
-    except: pass
-    await db.rmve_frwd(user)
+async def stop_process(workers, user, keep_task=False):
+    for client in workers: await POOL.release(client)
+    if not keep_task: await db.rmve_frwd(user)
     if Temp.FORWARDINGS > 0: Temp.FORWARDINGS -= 1
-    Temp.LOCK[user] = False
-
-# Filters & Utils
-async def extension_filter(ext, fname): return bool(ext and re.search(ext, fname))
-async def keyword_filter(keys, fname): return bool(keys and re.search(keys, fname))
-async def size_filter(mx, mn, size):
-    size_mb = size / (1024 * 1024)
-    if mx == 0 and mn == 0: return False
-    return not ((mn == 0 or size_mb >= mn) and (mx == 0 or size_mb <= mx))
 
+# Utils
 def get_media_id(msg):
     if msg.media: return getattr(getattr(msg, msg.media.value, None), 'file_id', None)
     return None
@@ -230,13 +773,11 @@ def get_size(size):
     return "%.2f %s" % (size, units[i])
 
 async def update_forward_db(user_id, i):
-    await db.update_forward(user_id, {'chat_id': i.FROM, 'toid': i.TO, 'forward_id': i.id, 'limit': i.limit, 'start_time': i.start, 'fetched': i.fetched, 'offset': i.fetched, 'deleted': i.deleted, 'total': i.total_files, 'duplicate': i.duplicate, 'skip': i.skip, 'filtered': i.filtered})
+    await db.update_forward(user_id, {'chat_id': i.FROM, 'toid': i.TO, 'targets': i.TARGETS, 'forward_id': i.id, 'limit': i.limit, 'start_time': i.start, 'fetched': i.fetched, 'offset': i.offset, 'deleted': i.deleted, 'total': i.total_files, 'duplicate': i.duplicate, 'skip': i.skip, 'filtered': i.filtered})
 
-async def msg_edit(msg, text, button=None, wait=False):
-    try: await msg.edit(text, reply_markup=button)
-    except MessageNotModified: pass
-    except FloodWait as e:
-        if wait: await asyncio.sleep(e.value); await msg_edit(msg, text, button, wait)
+async def msg_edit(msg, text, button=None):
+    # One-off states go through the HUD too, so a stale progress frame can't overwrite them
+    HUD.publish(msg, text, button, final=True)
 
 async def send_msg(bot, user, text):
     try: await bot.send_message(user, text=text)
@@ -244,11 +785,17 @@ async def send_msg(bot, user, text):
 
 async def store_vars(user_id):
     s = await db.get_forward_details(user_id)
-    fid = f'{user_id}-{s["fetched"]}'
-    STS(id=fid).store(s['chat_id'], s['toid'], s['skip'], s['limit'])
+    fid = s.get('forward_id') or f'{user_id}-{s["fetched"]}'
+    STS(fid).store(s['chat_id'], s['toid'], s['skip'], s['limit'], targets=s.get('targets'), user_id=user_id).restore(s)
     return fid
 
 @Client.on_callback_query(filters.regex(r'^terminate_frwd$'))
 async def terminate_handler(bot, m):
-    uid = m.from_user.id; Temp.LOCK[uid] = False; Temp.CANCEL[uid] = True
+    uid = m.from_user.id
+    # Forward tasks, plus supervised jobs that aren't tasks (unequify)
+    if not TASKS.for_user(uid) and not SUPERVISOR.by_owner(uid):
+        return await m.answer("Nothing is running.", show_alert=True)
+    Temp.CANCEL[uid] = True
+    # Interrupts the job right away, even mid-sleep or FloodWait
+    SUPERVISOR.cancel_owner(uid)
     await m.answer("Cancelling...", show_alert=True)
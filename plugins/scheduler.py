@@ -0,0 +1,177 @@
+import time
+import asyncio
+import logging
+import collections
+from config import Config, Temp
+from database import db
+from .supervisor import SUPERVISOR
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# ==============================================================================
+#  Fair-Share Job Scheduler
+# ==============================================================================
+
+QUEUE_LIMIT = 5   # Queued jobs per user
+
+class Scheduler:
+    """Admits forward jobs under global and per-account caps, round-robin across users.
+
+    Each user runs one job at a time (the notify document that resumes a job
+    is per user); further jobs wait in a persistent queue. When a slot frees,
+    users with queued jobs are served in turn, so a user with many queued
+    jobs cannot starve the others, and no account carries more than
+    Config.JOBS_PER_ACCOUNT jobs (they share its rate limit). A job whose
+    target chat is receiving another running job waits until that one ends.
+    """
+
+    def __init__(self):
+        self.queues = {}                      # user_id -> deque of job documents
+        self.order = collections.deque()      # users with queued jobs, next to serve first
+        self.running = {}                     # user_id -> account ids in use
+        self.current = {}                     # user_id -> id of the job it is running
+        self.ids = set()                      # ids of queued and running jobs
+        self.accounts = collections.Counter() # account id -> running jobs
+        self.targets = {}                     # user_id -> target chats of its running job
+        self.busy = collections.Counter()     # target chat id -> running jobs sending there
+        self.messages = {}                    # job id -> status message (this process only)
+        self.bot = None
+        self.runner = None
+        self._lock = asyncio.Lock()
+
+    async def setup(self, bot, runner):
+        """Reloads the persisted queue; `runner(bot, job, status_msg)` runs one job."""
+        self.bot, self.runner = bot, runner
+        async for job in await db.get_queued_jobs():
+            if job['_id'] not in self.ids: self._enqueue(job)
+        if self.queues: logger.info(f"Loaded {sum(map(len, self.queues.values()))} queued job(s)")
+        await self.schedule()
+
+    async def submit(self, user_id, job_id, params, accounts, status_msg=None):
+        """Queues a job. Returns its queue position (0 if it started right away), or None if the queue is full.
+
+        A job already queued or running is not added again; its current position is returned.
+        """
+        if job_id in self.ids: return self.position(user_id, job_id)
+        queue = self.queues.get(user_id, ())
+        if len(queue) >= QUEUE_LIMIT: return None
+        # Claimed before the first await, so a repeated tap can't slip in meanwhile
+        self.ids.add(job_id)
+        job = {'_id': job_id, 'user_id': user_id, 'sts': params, 'accounts': accounts, 'created': time.time()}
+        if status_msg: job.update(chat_id=status_msg.chat.id, msg_id=status_msg.id)
+        try: await db.add_job(job)
+        except Exception:
+            self.ids.discard(job_id)
+            raise
+        self.messages[job_id] = status_msg
+        self._enqueue(job)
+        await self.schedule()
+        return self.position(user_id, job_id)
+
+    async def cancel(self, user_id, job_id):
+        """Drops a queued job; False if it is not (or no longer) queued."""
+        queue = self.queues.get(user_id)
+        job = next((j for j in queue or () if j['_id'] == job_id), None)
+        if job is None: return False
+        queue.remove(job)
+        self.ids.discard(job_id)
+        if not queue: self._forget(user_id)
+        self.messages.pop(job_id, None)
+        await db.remove_job(job_id)
+        return True
+
+    def position(self, user_id, job_id):
+        for index, job in enumerate(self.queues.get(user_id, ())):
+            if job['_id'] == job_id: return index + 1
+        return 0
+
+    def is_running(self, user_id):
+        return user_id in self.running
+
+    def has_job(self, job_id):
+        return job_id in self.ids
+
+    def track(self, user_id, accounts, job_id=None, targets=None):
+        """Counts a job started outside the queue (resumed after restart) against the caps."""
+        self.accounts.subtract(self.running.get(user_id, ()))
+        self.running[user_id] = list(accounts)
+        self.accounts.update(accounts)
+        if targets is not None:
+            self.busy.subtract(self.targets.get(user_id, ()))
+            self.targets[user_id] = list(targets)
+            self.busy.update(targets)
+        if job_id:
+            self.current[user_id] = job_id
+            self.ids.add(job_id)
+
+    async def release(self, user_id):
+        self.accounts.subtract(self.running.pop(user_id, ()))
+        self.busy.subtract(self.targets.pop(user_id, ()))
+        self.ids.discard(self.current.pop(user_id, None))
+        await self.schedule()
+
+    def close(self):
+        """Stops admitting jobs (shutdown); queued ones stay persisted."""
+        self.runner = None
+
+    async def schedule(self):
+        """Starts queued jobs while slots are free, one user at a time in turn."""
+        if self.runner is None: return
+        async with self._lock:
+            skipped = 0
+            while self.order and skipped < len(self.order) and len(self.running) < Config.MAX_JOBS:
+                user_id = self.order[0]
+                job = self.queues[user_id][0]
+                if not self._admissible(user_id, job):
+                    self.order.rotate(-1)
+                    skipped += 1
+                    continue
+                self.queues[user_id].popleft()
+                self.order.popleft()
+                if self.queues[user_id]: self.order.append(user_id)
+                else: del self.queues[user_id]
+                skipped = 0
+                await self._start(job)
+
+    def _admissible(self, user_id, job):
+        # Unequify holds Temp.LOCK while it runs for this user
+        if user_id in self.running or Temp.LOCK.get(user_id): return False
+        # One running job per target chat; this one stays queued until it is free
+        if any(self.busy[chat_id] > 0 for chat_id in job_targets(job)): return False
+        return all(self.accounts[account] < Config.JOBS_PER_ACCOUNT for account in job['accounts'])
+
+    async def _start(self, job):
+        await db.remove_job(job['_id'])
+        self.track(job['user_id'], job['accounts'], job['_id'], job_targets(job))
+        # Named per job: the finishing job is still registered when its release() starts the next one
+        SUPERVISOR.launch(
+            f"forward:{job['_id']}", self._run(job, self.messages.pop(job['_id'], None)),
+            owner=job['user_id'], kind='forward', timeout=Config.JOB_TIMEOUT or None
+        )
+
+    async def _run(self, job, status_msg):
+        try:
+            await self.runner(self.bot, job, status_msg)
+        except Exception as e:
+            logger.error(f"Job {job['_id']} failed: {e}")
+        finally:
+            await self.release(job['user_id'])
+
+    def _enqueue(self, job):
+        user_id = job['user_id']
+        if user_id not in self.queues:
+            self.queues[user_id] = collections.deque()
+            self.order.append(user_id)
+        self.queues[user_id].append(job)
+        self.ids.add(job['_id'])
+
+    def _forget(self, user_id):
+        self.queues.pop(user_id, None)
+        if user_id in self.order: self.order.remove(user_id)
+
+def job_targets(job):
+    params = job['sts']
+    return params.get('targets') or [params.get('to_chat')]
+
+SCHEDULER = Scheduler()
@@ -29,7 +29,7 @@ async def update_configs(user_id, key, value):
     TOP_LEVEL_KEYS = [
         'caption', 'duplicate', 'db_uri', 'forward_tag', 
         'protect', 'min_size', 'max_size', 'extension', 
-        'keywords', 'button', 'filters'
+        'keywords', 'button', 'filters', 'sharding', 'mirror', 'sync', 'prescan'
     ]
     
     if key in TOP_LEVEL_KEYS:
@@ -252,7 +252,7 @@ async def settings_query(bot, query):
      new_value = False if value == "True" else True
      await update_configs(user_id, key, new_value)
      
-     page_2_keys = ['poll', 'protect', 'voice', 'animation', 'sticker', 'duplicate', 'link']
+     page_2_keys = ['poll', 'protect', 'voice', 'animation', 'sticker', 'duplicate', 'link', 'sharding', 'mirror', 'sync', 'prescan']
      if key in page_2_keys:
         await query.edit_message_reply_markup(reply_markup=await next_filters_buttons(user_id))
      else:
@@ -429,6 +429,10 @@ async def next_filters_buttons(user_id):
       btn('Polls', 'poll', f['poll']),
       btn('Protect', 'protect', data['protect']),
       btn('Links', 'link', f.get('link', True)),
+      btn('Multi Account', 'sharding', data.get('sharding', False)),
+      btn('Live Mirror', 'mirror', data.get('mirror', False)),
+      btn('Sync Edits', 'sync', data.get('sync', False)),
+      btn('Scan Target', 'prescan', data.get('prescan', False)),
       [InlineKeyboardButton('⫷ Back', 'settings#filters'), InlineKeyboardButton('Home 🏠', 'settings#main')]
   ]
   return InlineKeyboardMarkup(buttons)
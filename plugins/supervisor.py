@@ -0,0 +1,89 @@
+import time
+import asyncio
+import logging
+import contextvars
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# ==============================================================================
+#  Background Job Supervisor
+# ==============================================================================
+
+# The Job running in the current task (set inside supervised tasks only)
+CURRENT = contextvars.ContextVar('job', default=None)
+
+class Job:
+    """A supervised background task; `reason` says why it was cancelled (None if it wasn't)."""
+    __slots__ = ('name', 'owner', 'kind', 'task', 'started', 'reason', '_timer')
+
+    def __init__(self, name, owner, kind):
+        self.name = name
+        self.owner = owner
+        self.kind = kind
+        self.task = None
+        self.started = time.time()
+        self.reason = None
+        self._timer = None
+
+    def cancel(self, reason='user'):
+        """Interrupts the job at its current await (sleeps and FloodWait pauses included)."""
+        if self.task.done(): return False
+        self.reason = self.reason or reason
+        return self.task.cancel()
+
+class Supervisor:
+    """Runs long jobs as tracked tasks, off the update handlers.
+
+    Exceptions are logged and contained, optional timeouts cancel the job
+    with reason 'timeout', and the registry can be queried by name or owner.
+    """
+
+    def __init__(self):
+        self.jobs = {}   # name -> Job
+
+    def launch(self, name, coro, owner=None, kind='job', timeout=None):
+        if name in self.jobs:
+            coro.close()
+            raise RuntimeError(f"Job {name} is already running")
+        job = self.jobs[name] = Job(name, owner, kind)
+        job.task = asyncio.create_task(self._guard(job, coro))
+        if timeout:
+            job._timer = asyncio.get_running_loop().call_later(timeout, job.cancel, 'timeout')
+        return job
+
+    def get(self, name):
+        return self.jobs.get(name)
+
+    def by_owner(self, owner):
+        return [job for job in self.jobs.values() if job.owner == owner]
+
+    def cancel_owner(self, owner, reason='user'):
+        """Cancels every job of `owner`; returns how many were running."""
+        jobs = self.by_owner(owner)
+        for job in jobs: job.cancel(reason)
+        return len(jobs)
+
+    async def shutdown(self):
+        """Cancels all jobs with reason 'shutdown' and waits for their cleanup."""
+        jobs = list(self.jobs.values())
+        for job in jobs: job.cancel('shutdown')
+        await asyncio.gather(*(job.task for job in jobs), return_exceptions=True)
+
+    async def _guard(self, job, coro):
+        CURRENT.set(job)
+        try:
+            await coro
+        except asyncio.CancelledError:
+            logger.info(f"Job {job.name} cancelled ({job.reason or 'shutdown'})")
+            if job.reason in (None, 'shutdown'): raise
+        except Exception as e:
+            logger.exception(f"Job {job.name} crashed: {e}")
+        finally:
+            if job._timer: job._timer.cancel()
+            self.jobs.pop(job.name, None)
+
+def current_job():
+    return CURRENT.get()
+
+SUPERVISOR = Supervisor()
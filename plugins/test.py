@@ -1,17 +1,31 @@
 import re
-import asyncio
 import logging
-import random
 from typing import Union, Optional, AsyncGenerator
-from hydrogram import Client
-from hydrogram.errors import FloodWait
+from hydrogram import Client, enums, raw
 from hydrogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 from database import db
 from config import Config
+from .limiter import get_limiter
+from .records import decode_messages
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+# Content types that the server can narrow to with search_messages filters
+SEARCH_FILTERS = {
+    'photo': enums.MessagesFilter.PHOTO,
+    'video': enums.MessagesFilter.VIDEO,
+    'document': enums.MessagesFilter.DOCUMENT,
+    'audio': enums.MessagesFilter.AUDIO,
+    'voice': enums.MessagesFilter.VOICE_NOTE,
+    'animation': enums.MessagesFilter.ANIMATION
+}
+# Types the filter chain always lets through (no setting), searched on every narrowed task
+ALWAYS_SEARCHED = [enums.MessagesFilter.VIDEO_NOTE, enums.MessagesFilter.LOCATION, enums.MessagesFilter.CONTACT]
+
+# Share of deleted IDs above which user accounts switch to history iteration
+GAP_RATIO = 0.3
+
 BTN_URL_REGEX = re.compile(r"(\[([^\[]+?)]\[buttonurl:/{0,2}(.+?)(:same)?])")
 
 class ClientManager: 
@@ -64,52 +78,178 @@ class ClientManager:
             if client.is_connected: await client.disconnect()
 
 async def get_client(data, is_bot=True):
-    if is_bot: return Client("WB", Config.API_ID, Config.API_HASH, bot_token=data, in_memory=True)
-    return Client("WU", Config.API_ID, Config.API_HASH, session_string=data, in_memory=True)
+    # sleep_threshold=0: every FloodWait must reach the adaptive limiter
+    if is_bot: return Client("WB", Config.API_ID, Config.API_HASH, bot_token=data, in_memory=True, sleep_threshold=0)
+    return Client("WU", Config.API_ID, Config.API_HASH, session_string=data, in_memory=True, sleep_threshold=0)
 
-async def iter_messages(client, chat_id, limit, offset=0, filters=None, max_size=None):
+async def iter_messages(client, chat_id, limit, offset=0):
+    """Yields message records with IDs in [offset, limit] in ascending order.
+
+    Starts with dense GetMessages batches. Once GAP_RATIO of the IDs seen
+    turn out deleted, user accounts switch to GetHistory, which returns only
+    messages that exist (bots cannot call it and stay dense).
+    """
     current = offset
     BATCH_SIZE = 100 
+    limiter = get_limiter(client)
+    peer = await client.resolve_peer(chat_id)
+    scanned = deleted = 0
     
-    while True:
-        current_limit = min(BATCH_SIZE, limit - current)
-        if current_limit <= 0: return
-        
-        message_ids = list(range(current, current + current_limit + 1))
-        
-        try:
-            messages = await client.get_messages(chat_id, message_ids)
-        except FloodWait as e:
-            wait = e.value + random.randint(10, 20) # Extra safety on FloodWait
-            logger.warning(f"FloodWait! Sleeping {wait}s")
-            await asyncio.sleep(wait)
-            continue
-        except Exception: return
+    while current <= limit:
+        if not client.me.is_bot and scanned >= BATCH_SIZE and deleted >= scanned * GAP_RATIO:
+            async for message in iter_history(client, chat_id, limit, current):
+                yield message
+            return
 
+        message_ids = list(range(current, min(current + BATCH_SIZE, limit + 1)))
+        # Errors propagate: ending quietly here would report a partial job as completed
+        messages = await fetch_records(client, peer, message_ids, limiter)
         if not messages: return
 
+        current = message_ids[-1] + 1
+        scanned += len(message_ids)
         for message in messages:
-            current += 1
             if not message: continue
-            
-            is_filtered = False
-            if filters:
-                for media in ['photo', 'video', 'document', 'audio', 'voice', 'sticker', 'animation']:
-                    if getattr(message, media, None) and media in filters:
-                        is_filtered = True; break
-                if message.text and 'text' in filters: is_filtered = True
-                if not is_filtered and 'link' in filters:
-                    entities = (message.entities or []) + (message.caption_entities or [])
-                    for entity in entities:
-                        if entity.type.name in ["URL", "TEXT_LINK"]:
-                            is_filtered = True; break
-            
-            if is_filtered: yield "FILTERED"
-            else: yield message
-        
-        # --- ULTRA SAFE DELAY (Fetching) ---
-        # 5 se 10 second ka random delay har batch ke baad
-        await asyncio.sleep(random.randint(5, 10))
+            if message.empty: deleted += 1
+            yield message
+
+async def fetch_records(client, peer, message_ids, limiter):
+    """Raw GetMessages for `message_ids`, decoded into records in ascending ID order."""
+    ids = [raw.types.InputMessageID(id=i) for i in message_ids]
+    if isinstance(peer, raw.types.InputPeerChannel):
+        channel = raw.types.InputChannel(channel_id=peer.channel_id, access_hash=peer.access_hash)
+        r = await limiter.call(client.invoke, raw.functions.channels.GetMessages(channel=channel, id=ids))
+    else:
+        r = await limiter.call(client.invoke, raw.functions.messages.GetMessages(id=ids))
+    return sorted(await decode_messages(client, r), key=lambda m: m.id)
+
+async def iter_history(client, chat_id, limit, offset, size=100):
+    """Gap-skipping iterator: only existing messages, `size` per request, oldest first."""
+    limiter = get_limiter(client)
+    peer = await client.resolve_peer(chat_id)
+    current = offset
+    while current <= limit:
+        # offset_id + negative add_offset walks forward from `current`
+        r = await limiter.call(client.invoke, raw.functions.messages.GetHistory(
+            peer=peer, offset_id=current, offset_date=0, add_offset=-size, limit=size,
+            max_id=limit + 1, min_id=current - 1, hash=0
+        ))
+        messages = sorted(
+            (m for m in await decode_messages(client, r) if current <= m.id <= limit),
+            key=lambda m: m.id
+        )
+        if not messages: return
+        for message in messages: yield message
+        current = messages[-1].id + 1
+
+def plan_search_filters(disabled):
+    """Search filters covering every enabled content type, or None if narrowing can't apply.
+
+    Text, polls and stickers have no search filter, so they must all be
+    disabled; anything else the user allows must map to a MessagesFilter.
+    Video notes, locations (venues included) and contacts can't be disabled,
+    so they are always searched too. Dice and games have no search filter;
+    a narrowed task skips them (the only types it loses).
+    """
+    disabled = set(disabled or [])
+    if not {'text', 'poll', 'sticker'} <= disabled:
+        return None
+    enabled = {t for t in SEARCH_FILTERS if t not in disabled}
+    if not enabled:
+        return None
+    if {'photo', 'video'} <= enabled:
+        enabled -= {'photo', 'video'}
+        return [enums.MessagesFilter.PHOTO_VIDEO] + [SEARCH_FILTERS[t] for t in sorted(enabled)] + ALWAYS_SEARCHED
+    return [SEARCH_FILTERS[t] for t in sorted(enabled)] + ALWAYS_SEARCHED
+
+async def iter_search(client, chat_id, limit, offset, search_filters, size=100):
+    """Streams only messages matching `search_filters`, merged in ascending ID order."""
+    streams = [_search_stream(client, chat_id, limit, offset, f, size) for f in search_filters]
+    heads = {}
+    for stream in streams:
+        heads[stream] = await anext(stream, None)
+    last_id = None
+    while True:
+        live = [(m.id, i) for i, m in enumerate(heads.values()) if m is not None]
+        if not live: return
+        _, index = min(live)
+        stream = streams[index]
+        message = heads[stream]
+        heads[stream] = await anext(stream, None)
+        if message.id != last_id:
+            last_id = message.id
+            yield message
+
+async def _search_stream(client, chat_id, limit, offset, search_filter, size):
+    limiter = get_limiter(client)
+    peer = await client.resolve_peer(chat_id)
+    current = offset
+    while current <= limit:
+        # Same forward walk as iter_history, restricted server-side to one media filter
+        r = await limiter.call(client.invoke, raw.functions.messages.Search(
+            peer=peer, q="", filter=search_filter.value(), min_date=0, max_date=0,
+            offset_id=current, add_offset=-size, limit=size,
+            max_id=limit + 1, min_id=current - 1, hash=0
+        ))
+        messages = sorted(
+            (m for m in await decode_messages(client, r) if current <= m.id <= limit),
+            key=lambda m: m.id
+        )
+        if not messages: return
+        for message in messages: yield message
+        current = messages[-1].id + 1
+
+async def iter_search_newest(client, chat_id, search_filter, size=100):
+    """Streams messages matching one search filter, newest first (search_messages' order)."""
+    limiter = get_limiter(client)
+    peer = await client.resolve_peer(chat_id)
+    offset_id = 0
+    while True:
+        r = await limiter.call(client.invoke, raw.functions.messages.Search(
+            peer=peer, q="", filter=search_filter.value(), min_date=0, max_date=0,
+            offset_id=offset_id, add_offset=0, limit=size, max_id=0, min_id=0, hash=0
+        ))
+        messages = sorted(await decode_messages(client, r), key=lambda m: m.id, reverse=True)
+        if not messages: return
+        for message in messages: yield message
+        offset_id = messages[-1].id
+
+async def latest_message(client, chat_id, **kwargs):
+    """Newest message get_chat_history returns for `kwargs` (None if none), fetched under the limiter."""
+    async def first():
+        async for message in client.get_chat_history(chat_id, limit=1, **kwargs): return message
+    return await get_limiter(client).call(first)
+
+async def find_id_by_date(client, chat_id, date, hi):
+    """First message ID in [1, hi] posted at or after `date` (hi + 1 if none), in O(log n) calls."""
+    limiter = get_limiter(client)
+    if not client.me.is_bot:
+        # One lookup: offset_date returns the newest message older than `date`
+        message = await latest_message(client, chat_id, offset_date=date)
+        return min(message.id + 1, hi + 1) if message else 1
+
+    lo, top = 1, hi + 1
+    while lo < top:
+        mid = (lo + top) // 2
+        probe = None
+        # First existing message at or above `mid`, scanning past fully deleted windows
+        for start in range(mid, hi + 1, 100):
+            messages = await limiter.call(client.get_messages, chat_id, list(range(start, min(start + 100, hi + 1))))
+            probe = next((m for m in messages if m and not m.empty), None)
+            if probe: break
+        if probe is None or probe.date >= date: top = mid
+        else: lo = probe.id + 1
+    return lo
+
+async def iter_shard(client, chat_id, limit, offset, index, shards, size=100):
+    """Yields lists of message records for every `shards`-th block of `size` IDs, starting at block `index`."""
+    limiter = get_limiter(client)
+    peer = await client.resolve_peer(chat_id)
+    start = offset + index * size
+    while start <= limit:
+        message_ids = list(range(start, min(start + size, limit + 1)))
+        yield await fetch_records(client, peer, message_ids, limiter)
+        start += shards * size
 
 def parse_buttons(text, markup=True):
     if not text: return None
@@ -5,8 +5,13 @@ from hydrogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 
 # --- Custom Modules ---
 from database import db
-from config import Temp
-from .test import get_client
+from config import Config, Temp
+from .pool import POOL
+from .limiter import get_limiter
+from .test import iter_search_newest
+from .scheduler import SCHEDULER
+from .supervisor import SUPERVISOR
+from .hud import HUD
 from script import Script
 
 # --- Constants ---
@@ -41,7 +46,7 @@ async def unequify_handler(client, message):
     user_id = message.from_user.id
     
     # 1. Check Locks
-    if Temp.LOCK.get(user_id):
+    if Temp.LOCK.get(user_id) or SCHEDULER.is_running(user_id):
         return await message.reply("<b>⚠️ Wait!</b> A task is already running.")
     
     Temp.CANCEL[user_id] = False
@@ -96,25 +101,33 @@ async def unequify_handler(client, message):
     
     # 5. Start Userbot
     try:
-        userbot = await get_client(_bot['session'], is_bot=False)
-        await userbot.start()
+        userbot = await POOL.acquire(_bot['session'], is_bot=False)
     except Exception as e:
         return await status_msg.edit(f"<b>❌ Userbot Login Failed:</b> `{e}`")
 
     # 6. Verify Permissions
     try:
-        test = await userbot.send_message(chat_id, "Testing Permissions...")
-        await test.delete()
+        limiter = get_limiter(userbot)
+        test = await limiter.call(userbot.send_message, chat_id, "Testing Permissions...")
+        await limiter.call(test.delete)
     except Exception:
-        await userbot.stop()
+        await POOL.release(userbot)
         return await status_msg.edit("<b>❌ Error:</b> Userbot must be an <b>Admin</b> in the target chat with Delete permissions.")
 
-    # ==========================================================================
-    #  Core Logic: De-Duplication
-    # ==========================================================================
-    
+    # Runs in the background so the handler returns right away
     Temp.LOCK[user_id] = True
-    
+    SUPERVISOR.launch(
+        f"unequify:{user_id}", run_unequify(user_id, userbot, chat_id, status_msg),
+        owner=user_id, kind='unequify', timeout=Config.JOB_TIMEOUT or None
+    )
+
+
+# ==============================================================================
+#  Core Logic: De-Duplication
+# ==============================================================================
+
+async def run_unequify(user_id, userbot, chat_id, status_msg):
+    """Supervised job: deletes duplicate documents, releasing the lock and userbot when done."""
     unique_files = set() # To store file_unique_id
     duplicate_ids = []   # To store message_ids to delete
     
@@ -125,7 +138,8 @@ async def unequify_handler(client, message):
         # Initial HUD Update
         await update_hud(status_msg, total_scanned, deleted_count, 0, "Scanning...", CANCEL_BTN)
 
-        async for msg in userbot.search_messages(chat_id=chat_id, filter=enums.MessagesFilter.DOCUMENT):
+        # Limiter-driven search: pooled clients don't sleep through FloodWait themselves
+        async for msg in iter_search_newest(userbot, chat_id, enums.MessagesFilter.DOCUMENT):
             # Check Cancellation
             if Temp.CANCEL.get(user_id):
                 await update_hud(status_msg, total_scanned, deleted_count, len(unique_files), "Cancelled", COMPLETED_BTN)
@@ -150,23 +164,28 @@ async def unequify_handler(client, message):
 
             # Batch Delete (Every 100 duplicates)
             if len(duplicate_ids) >= 100:
-                await userbot.delete_messages(chat_id, duplicate_ids)
+                await get_limiter(userbot).call(userbot.delete_messages, chat_id, duplicate_ids)
                 deleted_count += len(duplicate_ids)
                 duplicate_ids = [] # Reset batch
                 await update_hud(status_msg, total_scanned, deleted_count, len(unique_files), "Deleting...", CANCEL_BTN)
 
         # Delete remaining duplicates
         if duplicate_ids:
-            await userbot.delete_messages(chat_id, duplicate_ids)
+            await get_limiter(userbot).call(userbot.delete_messages, chat_id, duplicate_ids)
             deleted_count += len(duplicate_ids)
 
         await update_hud(status_msg, total_scanned, deleted_count, len(unique_files), "Completed", COMPLETED_BTN)
 
+    except asyncio.CancelledError:
+        await update_hud(status_msg, total_scanned, deleted_count, len(unique_files), "Cancelled", COMPLETED_BTN)
+        raise
     except Exception as e:
-        await status_msg.edit(f"<b>❌ Error:</b> `{e}`")
+        HUD.publish(status_msg, f"<b>❌ Error:</b> `{e}`", final=True)
     finally:
         Temp.LOCK[user_id] = False
-        await userbot.stop()
+        await POOL.release(userbot)
+        # Jobs this user queued meanwhile may start now
+        await SCHEDULER.schedule()
 
 
 # ==============================================================================
@@ -194,7 +213,4 @@ async def update_hud(msg, scanned, deleted, unique, status, markup):
         status
     )
     
-    try:
-        await msg.edit(text, reply_markup=markup)
-    except Exception:
-        pass
+    HUD.publish(msg, text, markup, final=status in ("Completed", "Cancelled"))
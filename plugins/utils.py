@@ -2,63 +2,189 @@ import time
 from database import db
 from .test import parse_buttons
 
-# Global Dictionary to hold active task status in memory
-STATUS = {}
+TASK_TTL = 3600         # Idle seconds before an unstarted or finished task is evicted
+SWEEP_INTERVAL = 300
+
+class Task:
+    """One forward task's state (typed counters, no per-instance dict)."""
+    __slots__ = (
+        'id', 'user_id', 'FROM', 'TO', 'TARGETS', 'skip', 'offset', 'limit', 'total',
+        'fetched', 'filtered', 'deleted', 'duplicate', 'total_files',
+        'start_date', 'end_date', 'start', 'active', 'touched'
+    )
+
+    def __init__(self, task_id, user_id, from_chat, to_chat, skip, limit, start_date, end_date, targets):
+        self.id = task_id
+        self.user_id = user_id
+        self.FROM = from_chat
+        self.TO = to_chat
+        self.TARGETS = targets
+        self.skip = self.offset = self.fetched = skip
+        self.limit = self.total = limit
+        self.filtered = self.deleted = self.duplicate = self.total_files = 0
+        self.start_date = start_date
+        self.end_date = end_date
+        self.start = 0
+        self.active = False
+        self.touched = time.monotonic()
+
+    @property
+    def targets(self):
+        return self.TARGETS or [self.TO]
+
+class TaskRegistry:
+    """Tasks by ID, with O(1) lookups of running tasks by user and by target chat.
+
+    Only one running task may forward into a chat at a time. Tasks that never
+    start (an abandoned /forward prompt) or have finished are evicted once
+    idle for TASK_TTL.
+    """
+
+    def __init__(self):
+        self.tasks = {}       # task id -> Task
+        self.by_user = {}     # user_id -> set of running task ids
+        self.by_target = {}   # chat id -> id of the running task sending there
+        self.swept = time.monotonic()
+
+    def get(self, task_id):
+        return self.tasks.get(task_id)
+
+    def put(self, task):
+        self.sweep()
+        self.tasks[task.id] = task
+
+    def remove(self, task_id):
+        task = self.tasks.pop(task_id, None)
+        if task and task.active: self._unindex(task)
+
+    def activate(self, task_id, user_id):
+        """Marks a task as running (it is never evicted until finish()).
+
+        False if another running task is already forwarding into one of its targets.
+        """
+        task = self.tasks.get(task_id)
+        if task is None: return False
+        if task.active: return True
+        if self.busy_targets(task.targets): return False
+        task.user_id = user_id
+        task.active = True
+        self.by_user.setdefault(user_id, set()).add(task_id)
+        for chat_id in task.targets: self.by_target[chat_id] = task_id
+        return True
+
+    def finish(self, task_id):
+        task = self.tasks.get(task_id)
+        if task is None or not task.active: return
+        self._unindex(task)
+        task.active = False
+        task.touched = time.monotonic()
+
+    def for_user(self, user_id):
+        return [self.tasks[i] for i in self.by_user.get(user_id, ())]
+
+    def for_target(self, chat_id):
+        """The running task forwarding into `chat_id`, or None"""
+        task_id = self.by_target.get(chat_id)
+        return self.tasks[task_id] if task_id else None
+
+    def busy_targets(self, chat_ids):
+        return [chat_id for chat_id in chat_ids if chat_id in self.by_target]
+
+    def sweep(self, force=False):
+        now = time.monotonic()
+        if not force and now - self.swept < SWEEP_INTERVAL: return
+        self.swept = now
+        for task_id in [i for i, t in self.tasks.items() if not t.active and now - t.touched > TASK_TTL]:
+            del self.tasks[task_id]
+
+    def _unindex(self, task):
+        ids = self.by_user.get(task.user_id)
+        if ids is not None:
+            ids.discard(task.id)
+            if not ids: del self.by_user[task.user_id]
+        for chat_id in task.targets:
+            if self.by_target.get(chat_id) == task.id: del self.by_target[chat_id]
+
+TASKS = TaskRegistry()
 
 class STS:
+    """Handle on a registered Task (kept for the existing call sites)."""
+
     def __init__(self, task_id):
         self.id = task_id
-        self.data = STATUS
+
+    @property
+    def task(self):
+        return TASKS.get(self.id)
 
     def verify(self):
         """Check if the task ID exists in memory"""
-        return self.data.get(self.id)
-
-    def store(self, from_chat, to_chat, skip, limit):
-        """Initialize a new task"""
-        self.data[self.id] = {
-            "FROM": from_chat, 
-            'TO': to_chat, 
-            'total_files': 0, 
-            'skip': skip, 
-            'limit': limit,
-            'fetched': skip, 
-            'filtered': 0, 
-            'deleted': 0, 
-            'duplicate': 0, 
-            'total': limit, 
-            'start': 0
-        }
-        self.get(full=True)
+        return self.task
+
+    def store(self, from_chat, to_chat, skip, limit, start_date=None, end_date=None, targets=None, user_id=None):
+        """Initialize a new task (dates bound the range once resolved to IDs; targets fans out to several chats)"""
+        TASKS.put(Task(self.id, user_id, from_chat, to_chat, skip, limit, start_date, end_date, targets))
         return self
 
     def get(self, value=None, full=False):
-        """Retrieve task data. If full=True, sets attributes to self."""
-        values = self.data.get(self.id)
-        
-        if not values:
+        """Retrieve one value, or the Task record itself with full=True"""
+        task = self.task
+        if task is None:
             return None
+        if full:
+            return task
+        return getattr(task, value, None)
 
-        if not full:
-            return values.get(value)
-            
-        # Dynamically set attributes for easier access (e.g., self.fetched)
-        for k, v in values.items():
-            setattr(self, k, v)
-        return self
-
-    # --- FIX: Changed 'time_update' back to 'time' ---
     def add(self, key=None, value=1, time=False, start_time=None):
         """Update counters or start time"""
-        if self.id not in self.data:
+        task = self.task
+        if task is None:
             return
-
         if time:
-            current_time = start_time if start_time is not None else __import__('time').time()
-            self.data[self.id].update({'start': current_time})
+            task.start = start_time if start_time is not None else __import__('time').time()
         else:
-            current_val = self.data[self.id].get(key, 0)
-            self.data[self.id].update({key: current_val + value})
+            setattr(task, key, getattr(task, key) + value)
+
+    def bound(self, offset, limit):
+        """Narrows the ID range (e.g. after resolving date bounds)"""
+        task = self.task
+        if task:
+            task.skip = task.offset = task.fetched = offset
+            task.limit = task.total = limit
+
+    def commit(self, offset):
+        """Records the next source ID to resume from (everything below it is sent)"""
+        task = self.task
+        if task:
+            task.offset = max(offset, task.offset)
+
+    def restore(self, details):
+        """Reloads counters saved by update_forward_db (used on resume)"""
+        task = self.task
+        if task is None:
+            return
+        task.offset = task.fetched = details.get('offset') or task.skip
+        task.total_files = details.get('total', 0)
+        task.deleted = details.get('deleted', 0)
+        task.duplicate = details.get('duplicate', 0)
+        task.filtered = details.get('filtered', 0)
+        task.start = details.get('start_time') or time.time()
+
+    def params(self):
+        """The store() arguments that recreate this task (used by the job queue)"""
+        task = self.task
+        if task is None:
+            return {}
+        return {
+            'from_chat': task.FROM, 'to_chat': task.TO,
+            'skip': task.skip, 'limit': task.limit,
+            'start_date': task.start_date, 'end_date': task.end_date,
+            'targets': task.TARGETS, 'user_id': task.user_id
+        }
+
+    def delete(self):
+        """Clears the task from memory"""
+        TASKS.remove(self.id)
 
     def divide(self, num, by):
         """Safe division to avoid ZeroDivisionError"""
@@ -66,11 +192,6 @@ class STS:
             by = 1
         return int(num) / by
 
-    def delete(self):
-        """Clears the task from memory (Important for RAM optimization)"""
-        if self.id in self.data:
-            del self.data[self.id]
-
     async def get_data(self, user_id):
         """Fetches all necessary settings for the user"""
         # 1. Get Bot or Userbot
@@ -101,7 +222,11 @@ class STS:
             'max_size': max_size,
             'extensions': configs.get('extension'),
             'skip_duplicate': skip_dup,
-            'db_uri': configs.get('db_uri')
+            'db_uri': configs.get('db_uri'),
+            'sharding': bool(configs.get('sharding')),
+            'mirror': bool(configs.get('mirror')),
+            'sync': bool(configs.get('sync')),
+            'prescan': bool(configs.get('prescan'))
         }
 
         return (
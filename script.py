@@ -61,9 +61,11 @@ I can forward messages from one channel to another with advanced filters and cus
     # --- Prompt Messages ---
     FROM_MSG = "<b>❪ SOURCE CHAT ❫\n\nForward the last message from the Source Channel or send its Link.\n\n/cancel - To Stop</b>"
     
-    TO_MSG = "<b>❪ TARGET CHAT ❫\n\nSelect the Target Chat from the buttons below.\n\n/cancel - To Stop</b>"
+    TO_MSG = "<b>❪ TARGET CHAT ❫\n\nSelect one or more Target Chats from the buttons below, then tap ✔️ Done.\n\n/cancel - To Stop</b>"
     
-    SKIP_MSG = "<b>❪ SKIP MESSAGES ❫\n\nEnter the number of messages to skip from the start.\nExample: <code>100</code> (Skips first 100 messages).\n\nDefault: 0\n/cancel - To Stop</b>"
+    TO_MORE_MSG = "<b>❪ TARGET CHAT ❫\n\nSelected {} chat(s). Tap more chats (tap again to unselect), or ✔️ Done.\n\n/cancel - To Stop</b>"
+    
+    SKIP_MSG = "<b>❪ SKIP MESSAGES ❫\n\nEnter the number of messages to skip from the start.\nExample: <code>100</code> (Skips first 100 messages).\n\nOr send a date range to forward only that period:\n<code>2024-03-01</code> (Since date)\n<code>2024-03-01 2024-03-31</code> (Between dates)\n\nDefault: 0\n/cancel - To Stop</b>"
     
     CANCEL = "<b>✅ Process Cancelled Successfully.</b>"
     
@@ -101,4 +103,20 @@ Please verify the details before starting:
 
 <b>Click 'Yes' to start forwarding.</b>"""
 
+    PLAN_TXT = """<b><u>📊 DRY RUN PLAN</u></b>
+
+<b>★ Range:</b> `{first} → {last}` ({span} IDs)
+<b>★ Sampled:</b> `{sampled}` IDs in {batches} batches
+{media}
+<b>📤 Expected Sent:</b> `{sent}`
+<b>🚫 Filtered:</b> `{filtered}`
+<b>♻️ Duplicates:</b> `{duplicate}`
+<b>🗑 Deleted/Empty:</b> `{deleted}`
+
+<b>📡 API Calls:</b> `~{calls}` ({fetch_calls} fetch + {send_calls} send)
+<b>⚡ Rate:</b> `{rate:.2f}/s` over {workers} account(s)
+<b>⏳ Duration:</b> `~{duration}`
+
+<i>Estimates scale a sample of the source; nothing has been sent.</i>"""
+
     SETTINGS_TXT = """<b>⚙️ Settings Menu</b>\nConfigure your bots and filters here."""
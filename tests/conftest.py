@@ -0,0 +1,17 @@
+import os
+import sys
+import pytest
+
+# database.py builds its motor client at import time; it connects lazily
+os.environ.setdefault("DATABASE_URI", "mongodb://localhost:27017")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture(autouse=True)
+def fast_limiter(monkeypatch):
+    """Fresh limiters whose pacing and FloodWait backoff don't slow the tests down."""
+    from plugins import limiter
+    fast = {'bot': 1000.0, 'user': 1000.0}
+    monkeypatch.setattr(limiter, 'LIMITERS', {})
+    monkeypatch.setattr(limiter, 'LEARNED', dict(fast))
+    monkeypatch.setattr(limiter, 'MAX_RATE', dict(fast))
+    monkeypatch.setattr(limiter, 'MIN_RATE', 1000.0)
@@ -0,0 +1,42 @@
+import asyncio
+from hydrogram.file_id import FileId, FileType, FileUniqueId, FileUniqueType
+from plugins.db import MongoDB, legacy_key
+
+def document_file_id(media_id):
+    return FileId(file_type=FileType.DOCUMENT, dc_id=2, media_id=media_id, access_hash=77, file_reference=b"ref").encode()
+
+def unique_id(media_id):
+    return FileUniqueId(file_unique_type=FileUniqueType.DOCUMENT, media_id=media_id).encode()
+
+class FakeFiles:
+    def __init__(self, docs):
+        self.docs = docs
+        self.writes = []
+
+    def find(self, *args, **kwargs):
+        async def cursor():
+            for doc in self.docs: yield doc
+        return cursor()
+
+    async def bulk_write(self, operations, ordered=True):
+        self.writes.extend(operations)
+
+def test_legacy_key_matches_file_unique_id():
+    assert legacy_key(document_file_id(123)) == unique_id(123)
+    assert legacy_key("not-a-file-id") is None
+
+def test_iter_keys_converts_and_backfills_legacy_docs():
+    store = MongoDB("mongodb://unused", "db", "files")
+    store.files = FakeFiles([
+        {"_id": 1, "file_unique_id": unique_id(1)},
+        {"_id": 2, "file_id": document_file_id(2)},
+        {"_id": 3, "file_id": "garbage"},
+    ])
+
+    async def run():
+        return [key async for key in store.iter_keys()]
+
+    assert asyncio.run(run()) == [unique_id(1), unique_id(2)]
+    update, = store.files.writes
+    assert update._filter == {"_id": 2}
+    assert update._doc == {"$set": {"file_unique_id": unique_id(2)}}
@@ -0,0 +1,34 @@
+import asyncio
+import types
+from plugins import regix
+from plugins.dedup import DedupIndex
+from plugins.utils import STS
+
+class MemoryStore:
+    def __init__(self): self.files = []
+    async def add_file(self, key): self.files.append(key)
+
+def document(message_id, key):
+    return types.SimpleNamespace(id=message_id, empty=False, service=False, document=types.SimpleNamespace(file_unique_id=key))
+
+def test_keys_are_stored_only_once_their_send_commits():
+    async def run():
+        store = MemoryStore()
+        index = DedupIndex(store)
+        sts = STS('dedup-hold').store(-1, -2, 1, 100, user_id=7)
+        in_q, out_q = asyncio.Queue(), asyncio.Queue()
+        for message in [document(1, 'a'), document(2, 'b'), document(3, 'a'), regix.END]: in_q.put_nowait(message)
+        accept_all = types.SimpleNamespace(reject=lambda message: False)
+
+        await regix.filter_stage(7, None, sts, {'skip_duplicate': True}, accept_all, in_q, out_q, index)
+        assert [out_q.get_nowait().id for _ in range(2)] == [1, 2]
+        assert sts.get('duplicate') == 1
+        # Read ahead, not yet sent: nothing persisted a resume would treat as duplicate
+        assert store.files == []
+
+        fan = regix.FanOut(sts, [-2], index)
+        await fan.commit(-2, 2)
+        assert store.files == ['a']
+        await fan.commit(-2, 3)
+        assert store.files == ['a', 'b'] and not index.unsent
+    asyncio.run(run())
@@ -0,0 +1,60 @@
+import asyncio
+import types
+from hydrogram import enums, raw
+from hydrogram.errors import FloodWait
+from plugins import test as fetch
+
+class FloodingClient:
+    """Raises one FloodWait per call type before answering (clients run with sleep_threshold=0)."""
+
+    def __init__(self, account_id, history=(), pages=()):
+        self.me = types.SimpleNamespace(id=account_id, is_bot=False)
+        self.history = list(history)
+        self.pages = list(pages)
+        self.flooded = set()
+        self.calls = []
+
+    def flood_once(self, kind):
+        if kind not in self.flooded:
+            self.flooded.add(kind)
+            raise FloodWait(value=0)
+
+    async def get_chat_history(self, chat_id, limit=0, **kwargs):
+        self.flood_once('history')
+        for message in self.history[:limit]: yield message
+
+    async def resolve_peer(self, chat_id):
+        return raw.types.InputPeerEmpty()
+
+    async def invoke(self, query):
+        self.flood_once('search')
+        self.calls.append(query.offset_id)
+        return self.pages.pop(0) if self.pages else raw.types.messages.Messages(messages=[], chats=[], users=[])
+
+def test_latest_message_retries_after_floodwait():
+    client = FloodingClient(501, history=[types.SimpleNamespace(id=77)])
+    message = asyncio.run(fetch.latest_message(client, -100))
+    assert message.id == 77 and client.flooded == {'history'}
+
+def test_latest_message_of_empty_chat():
+    assert asyncio.run(fetch.latest_message(FloodingClient(502), -100)) is None
+
+def test_search_newest_pages_down_under_the_limiter(monkeypatch):
+    async def decode(client, r): return list(r.messages)
+    monkeypatch.setattr(fetch, 'decode_messages', decode)
+    page = lambda *ids: types.SimpleNamespace(messages=[types.SimpleNamespace(id=i) for i in ids])
+    client = FloodingClient(503, pages=[page(9, 8, 7), page(5, 4)])
+
+    async def run():
+        return [m.id async for m in fetch.iter_search_newest(client, -100, enums.MessagesFilter.DOCUMENT)]
+
+    assert asyncio.run(run()) == [9, 8, 7, 5, 4]
+    assert client.calls == [0, 7, 4] and client.flooded == {'search'}
+
+def test_narrowed_search_keeps_types_without_a_setting():
+    everything_but_documents = ['text', 'poll', 'sticker', 'photo', 'video', 'audio', 'voice', 'animation']
+    assert fetch.plan_search_filters(everything_but_documents) == [
+        enums.MessagesFilter.DOCUMENT, enums.MessagesFilter.VIDEO_NOTE,
+        enums.MessagesFilter.LOCATION, enums.MessagesFilter.CONTACT
+    ]
+    assert fetch.plan_search_filters(['photo']) is None
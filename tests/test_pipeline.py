@@ -0,0 +1,150 @@
+import asyncio
+import types
+import pytest
+from hydrogram import raw
+from plugins import regix
+from plugins.utils import STS
+from plugins.dedup import DedupIndex
+
+SOURCE, TARGET = -1001, -1002
+
+def make_sts(task_id):
+    return STS(task_id).store(SOURCE, TARGET, 1, 500, user_id=7)
+
+def make_worker(account_id=99):
+    return types.SimpleNamespace(me=types.SimpleNamespace(id=account_id, is_bot=True))
+
+def test_fetch_error_fails_the_send_stage(monkeypatch):
+    async def broken_iter(*args):
+        yield types.SimpleNamespace(id=1, empty=False, service=False, document=None)
+        raise ConnectionError("source gone")
+
+    monkeypatch.setattr(regix, 'iter_messages', broken_iter)
+    datas = {'skip_duplicate': False}
+    reject_all = types.SimpleNamespace(reject=lambda message: True)
+
+    async def run():
+        sts, worker = make_sts('pipeline-fetch'), make_worker()
+        fetched_q, send_q = asyncio.Queue(), asyncio.Queue()
+        await regix.fetch_stage([worker], sts, None, fetched_q)
+        await regix.filter_stage(7, None, sts, datas, reject_all, fetched_q, send_q, DedupIndex(None))
+        assert isinstance(send_q.get_nowait(), regix.StageError)
+
+        send_q.put_nowait(regix.StageError(ConnectionError("source gone")))
+        with pytest.raises(ConnectionError):
+            await regix.send_stage(None, [worker], 7, None, sts, send_q, True, None, False, None)
+    asyncio.run(run())
+
+def test_failed_shard_reader_fails_the_fetch(monkeypatch):
+    async def shards(client, chat_id, limit, offset, index, n):
+        if client.me.id == 2: raise PermissionError("not a member")
+        for start in range(offset + index * 100, limit + 1, n * 100):
+            yield [types.SimpleNamespace(id=start)]
+
+    monkeypatch.setattr(regix, 'iter_shard', shards)
+
+    async def run():
+        sts = make_sts('pipeline-shard')
+        out_q = asyncio.Queue()
+        await regix.fetch_stage([make_worker(1), make_worker(2)], sts, None, out_q)
+        items = [out_q.get_nowait() for _ in range(out_q.qsize())]
+        assert isinstance(items[-1], regix.StageError)
+        assert isinstance(items[-1].error, PermissionError)
+    asyncio.run(run())
+
+def test_cancelled_send_stage_stops_copies_in_flight(monkeypatch):
+    started, cancelled = [], []
+
+    async def hanging_copy(user, bot, details, m, sts, to=None):
+        started.append(details['msg_id'])
+        try: await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            cancelled.append(details['msg_id'])
+            raise
+
+    monkeypatch.setattr(regix, 'copy_message_safe', hanging_copy)
+
+    async def run():
+        sts, send_q = make_sts('pipeline-window'), asyncio.Queue()
+        # A button forces one-by-one copies through the send window
+        send_q.put_nowait(types.SimpleNamespace(id=1, media=None, media_group_id=None, _client=None))
+        sender = asyncio.create_task(regix.send_stage(None, [make_worker()], 7, None, sts, send_q, False, None, False, 'button'))
+        while not started: await asyncio.sleep(0)
+        sender.cancel()
+        with pytest.raises(asyncio.CancelledError): await sender
+        assert cancelled == [1]
+    asyncio.run(run())
+
+def test_send_window_starts_a_copy_once_the_previous_is_acknowledged():
+    events, acks = [], {}
+
+    async def send(worker, details):
+        events.append(('start', details))
+        acks[details] = asyncio.get_running_loop().create_future()
+        await acks[details]
+        events.append(('ack', details))
+        return details
+
+    async def committed(message_id, worker, sent):
+        events.append(('commit', message_id))
+
+    async def run():
+        window = regix.SendWindow(send, committed)
+        await window.submit(1, None, 1)
+        second = asyncio.create_task(window.submit(2, None, 2))
+        for _ in range(5): await asyncio.sleep(0)
+        assert events == [('start', 1)]
+        acks[1].set_result(None)
+        await second
+        while 2 not in acks: await asyncio.sleep(0)
+        acks[2].set_result(None)
+        await window.drain()
+        assert events.index(('start', 2)) > events.index(('ack', 1))
+        assert [e for e in events if e[0] == 'commit'] == [('commit', 1), ('commit', 2)]
+    asyncio.run(run())
+
+def test_album_buttons_follow_the_album(monkeypatch):
+    sent = []
+
+    class AlbumClient:
+        me = types.SimpleNamespace(id=99, is_bot=True)
+        parser = types.SimpleNamespace(parse=lambda text: asyncio.sleep(0, {'message': text}))
+        ids = iter(range(1, 100))
+
+        def rnd_id(self): return next(self.ids)
+        async def resolve_peer(self, chat_id): return None
+        async def invoke(self, query):
+            sent.append(('album', len(query.multi_media)))
+            return raw.types.Updates(updates=[], users=[], chats=[], date=0, seq=0)
+        async def send_message(self, chat_id, text, reply_markup=None, protect_content=None):
+            sent.append(('buttons', reply_markup))
+
+    monkeypatch.setattr(regix.utils, 'get_input_media_from_file_id', lambda file_id: None)
+    album = [types.SimpleNamespace(id=i, media=None) for i in (1, 2)]
+    asyncio.run(regix.copy_album_safe(7, AlbumClient(), album, ['a', 'b'], None, make_sts('pipeline-album'), False, TARGET, 'button'))
+    assert sent == [('album', 2), ('buttons', 'button')]
+
+class DenseClient:
+    """Bot worker answering GetMessages with empty slots, then failing on batch `fail_at`."""
+
+    def __init__(self, fail_at):
+        self.me = types.SimpleNamespace(id=300, is_bot=True)
+        self.fail_at = fail_at
+        self.batches = 0
+
+    async def resolve_peer(self, chat_id):
+        return raw.types.InputPeerChannel(channel_id=1001, access_hash=1)
+
+    async def invoke(self, query):
+        self.batches += 1
+        if self.batches == self.fail_at: raise ConnectionError("channel lost")
+        return raw.types.messages.Messages(messages=[raw.types.MessageEmpty(id=m.id) for m in query.id], chats=[], users=[])
+
+def test_dense_fetch_error_fails_the_fetch():
+    async def run():
+        sts, out_q = make_sts('pipeline-dense'), asyncio.Queue()
+        await regix.fetch_stage([DenseClient(fail_at=2)], sts, None, out_q)
+        items = [out_q.get_nowait() for _ in range(out_q.qsize())]
+        assert len(items) == 101 and all(item.empty for item in items[:100])
+        assert isinstance(items[-1], regix.StageError) and isinstance(items[-1].error, ConnectionError)
+    asyncio.run(run())
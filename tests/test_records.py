@@ -0,0 +1,39 @@
+import io
+import asyncio
+from hydrogram import Client, enums, raw, types
+from hydrogram.raw.core import TLObject
+from plugins.records import MessageRecord, decode_messages, materialize
+
+CHANNEL_ID = 1234567890
+
+def channel_messages(media=None, text=""):
+    """A messages.ChannelMessages as it comes off the wire (serialized and read back)."""
+    channel = raw.types.Channel(id=CHANNEL_ID, title="Source", photo=raw.types.ChatPhotoEmpty(), date=0, access_hash=1)
+    message = raw.types.Message(
+        id=42, peer_id=raw.types.PeerChannel(channel_id=CHANNEL_ID), date=1700000000,
+        message=text, media=media, post=True
+    )
+    r = raw.types.messages.ChannelMessages(pts=1, count=1, messages=[message], topics=[], chats=[channel], users=[])
+    return TLObject.read(io.BytesIO(r.write()))
+
+def make_client():
+    return Client("records-test", api_id=1, api_hash="x", in_memory=True, no_updates=True)
+
+def test_record_materializes_to_message():
+    async def run():
+        record, = await decode_messages(make_client(), channel_messages(text="hello"))
+        assert isinstance(record, MessageRecord)
+        assert record.text == "hello" and record.media is None
+        full = await materialize(record)
+        assert isinstance(full, types.Message)
+        assert (full.id, full.text, full.chat.id) == (42, "hello", int(f"-100{CHANNEL_ID}"))
+        assert await materialize(record) is full
+    asyncio.run(run())
+
+def test_undecoded_media_is_fully_parsed():
+    async def run():
+        geo = raw.types.MessageMediaGeo(geo=raw.types.GeoPoint(long=1.0, lat=2.0, access_hash=0))
+        message, = await decode_messages(make_client(), channel_messages(media=geo))
+        assert isinstance(message, types.Message)
+        assert message.media == enums.MessageMediaType.LOCATION
+    asyncio.run(run())
@@ -0,0 +1,135 @@
+import asyncio
+import pytest
+from plugins import scheduler as scheduler_module
+from plugins.scheduler import Scheduler
+from plugins.supervisor import SUPERVISOR
+
+@pytest.fixture
+def stored(monkeypatch):
+    """In-memory stand-in for the jobs collection."""
+    jobs = {}
+
+    async def add_job(job): jobs[job['_id']] = job
+    async def remove_job(job_id): jobs.pop(job_id, None)
+    async def get_queued_jobs():
+        async def cursor():
+            for job in list(jobs.values()): yield job
+        return cursor()
+
+    monkeypatch.setattr(scheduler_module.db, 'add_job', add_job)
+    monkeypatch.setattr(scheduler_module.db, 'remove_job', remove_job)
+    monkeypatch.setattr(scheduler_module.db, 'get_queued_jobs', get_queued_jobs)
+    return jobs
+
+async def settle():
+    for _ in range(10): await asyncio.sleep(0)
+
+class Runner:
+    """Scheduler runner whose jobs finish when the test says so."""
+
+    def __init__(self):
+        self.started = []
+        self.gates = {}
+
+    async def __call__(self, bot, job, status_msg):
+        self.started.append(job['_id'])
+        self.gates[job['_id']] = asyncio.Event()
+        await self.gates[job['_id']].wait()
+
+    async def finish(self, job_id):
+        self.gates[job_id].set()
+        await settle()
+
+def test_two_queued_jobs_for_one_user(stored):
+    async def run():
+        scheduler, runner = Scheduler(), Runner()
+        await scheduler.setup(None, runner)
+        assert await scheduler.submit(1, 'a', {}, [10]) == 0
+        assert await scheduler.submit(1, 'b', {}, [10]) == 1
+        await settle()
+        assert runner.started == ['a']
+
+        await runner.finish('a')
+        assert runner.started == ['a', 'b']
+        assert not stored and scheduler.is_running(1)
+
+        await runner.finish('b')
+        assert not scheduler.is_running(1) and not +scheduler.accounts
+        assert not SUPERVISOR.jobs
+    asyncio.run(run())
+
+def test_queued_job_starts_after_resumed_job(stored):
+    async def run():
+        scheduler, runner = Scheduler(), Runner()
+        resumed = asyncio.Event()
+
+        async def resume_forward():
+            try: await resumed.wait()
+            finally: await scheduler.release(1)
+
+        scheduler.track(1, [10])
+        SUPERVISOR.launch("resume:1", resume_forward(), owner=1, kind='forward')
+        await scheduler.setup(None, runner)
+        assert await scheduler.submit(1, 'b', {}, [10]) == 1
+
+        resumed.set()
+        await settle()
+        assert runner.started == ['b']
+        await runner.finish('b')
+        assert not scheduler.is_running(1) and not SUPERVISOR.jobs
+    asyncio.run(run())
+
+def test_resubmitted_job_is_not_queued_again(stored):
+    async def run():
+        scheduler, runner = Scheduler(), Runner()
+        await scheduler.setup(None, runner)
+        # A second tap on Start, while the first submit is still awaiting the db
+        first = asyncio.create_task(scheduler.submit(1, 'x', {}, [10]))
+        await asyncio.sleep(0)
+        assert await scheduler.submit(1, 'x', {}, [10]) == 0
+        assert await first == 0
+        assert await scheduler.submit(1, 'x', {}, [10]) == 0
+        await settle()
+        assert runner.started == ['x'] and not scheduler.queues
+
+        assert await scheduler.submit(1, 'y', {}, [10]) == 1
+        assert await scheduler.submit(1, 'y', {}, [10]) == 1
+        assert len(scheduler.queues[1]) == 1
+
+        await runner.finish('x')
+        await runner.finish('y')
+        assert not scheduler.has_job('x') and not scheduler.has_job('y')
+    asyncio.run(run())
+
+def test_busy_target_keeps_job_queued(stored):
+    async def run():
+        scheduler, runner = Scheduler(), Runner()
+        await scheduler.setup(None, runner)
+        assert await scheduler.submit(1, 'a', {'to_chat': -5}, [10]) == 0
+        # Another user's job into the same chat waits, and stays persisted meanwhile
+        assert await scheduler.submit(2, 'b', {'to_chat': -6, 'targets': [-6, -5]}, [20]) == 1
+        assert await scheduler.submit(3, 'c', {'to_chat': -7}, [30]) == 0
+        await settle()
+        assert runner.started == ['a', 'c'] and 'b' in stored
+
+        await runner.finish('a')
+        assert runner.started == ['a', 'c', 'b'] and not stored
+        await runner.finish('b')
+        await runner.finish('c')
+        assert not +scheduler.busy
+    asyncio.run(run())
+
+def test_resumed_task_holds_its_targets(stored):
+    async def run():
+        scheduler, runner = Scheduler(), Runner()
+        scheduler.track(1, [], targets=[-5])
+        await scheduler.setup(None, runner)
+        assert await scheduler.submit(2, 'b', {'to_chat': -5}, [20]) == 1
+        scheduler.track(1, [10], 'resumed')
+        assert scheduler.busy[-5] == 1
+
+        await scheduler.release(1)
+        await settle()
+        assert runner.started == ['b']
+        await runner.finish('b')
+    asyncio.run(run())
@@ -0,0 +1,28 @@
+from plugins.utils import STS, TASKS
+
+def test_one_running_task_per_target():
+    first = STS('registry-a').store(-1, -10, 1, 100, targets=[-10, -20])
+    second = STS('registry-b').store(-2, -20, 1, 100)
+
+    assert TASKS.activate(first.id, 1)
+    assert TASKS.for_target(-20) is first.get(full=True)
+    assert TASKS.busy_targets([-20, -30]) == [-20]
+    assert not TASKS.activate(second.id, 2)
+    assert not second.get(full=True).active
+
+    TASKS.finish(first.id)
+    assert TASKS.for_target(-10) is None
+    assert TASKS.activate(second.id, 2)
+    TASKS.finish(second.id)
+    assert not TASKS.by_target
+
+def test_running_tasks_by_user():
+    first = STS('registry-u1').store(-1, -40, 1, 100)
+    second = STS('registry-u2').store(-2, -50, 1, 100)
+    assert TASKS.activate(first.id, 9) and TASKS.activate(second.id, 9)
+    assert {task.id for task in TASKS.for_user(9)} == {first.id, second.id}
+
+    TASKS.finish(first.id)
+    assert [task.id for task in TASKS.for_user(9)] == [second.id]
+    TASKS.remove(second.id)
+    assert TASKS.for_user(9) == [] and not TASKS.by_user